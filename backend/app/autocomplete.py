@@ -0,0 +1,252 @@
+"""In-process autocomplete index for meal search.
+
+Each active user gets a sorted array of ``(token, text)`` pairs over their
+distinct normalized meal texts plus those texts in rank order, loaded lazily from ``meal_search_entries`` on the
+first search. Committed meal writes update loaded indexes incrementally via
+the changes :func:`app.search.refresh_entry` records on the session, and
+whole users are evicted least-recently-used once the cached entry count
+exceeds ``AUTOCOMPLETE_MAX_ENTRIES``.
+"""
+
+import heapq
+import os
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, run_sync
+from app.db_models import MealSearchEntry
+from app.openai_service import normalize_text
+from app.search import PENDING_UPDATES_KEY, tokenize
+
+AUTOCOMPLETE_ENABLED = os.environ.get("AUTOCOMPLETE_ENABLED", "1") == "1"
+AUTOCOMPLETE_MAX_ENTRIES = int(os.environ.get("AUTOCOMPLETE_MAX_ENTRIES", "100000"))
+
+
+@dataclass
+class Suggestion:
+    text_input: str
+    calories: int
+    protein: float
+    carbs: float
+    fat: float
+    sugar: float
+    last_used_at: datetime
+    use_count: int
+
+
+def _rank(suggestion: Suggestion, key: str) -> tuple:
+    # Ascending order is best first: most used, then most recent
+    return (-suggestion.use_count, -suggestion.last_used_at.timestamp(), key)
+
+
+class UserIndex:
+    """Suggestions keyed by normalized text, so spelling variants of a meal merge into one.
+
+    ``tokens`` finds the texts whose words start with a prefix; ``ranked``
+    lists every text best first, so a broad prefix only walks the top of it.
+    Searches run without the module lock: the lists are read through slices,
+    which copy atomically, and the dicts through single lookups, so a
+    concurrent writer can at worst make a search miss or misrank the text it
+    is changing.
+    """
+
+    def __init__(self, suggestions: list[Suggestion]):
+        self.variants: dict[str, dict[str, Suggestion]] = {}
+        self.entries: dict[str, Suggestion] = {}
+        # " " + the text's words, so " " + prefix is a substring exactly when it starts one
+        self.spaced: dict[str, str] = {}
+        self.ranks: dict[str, tuple] = {}
+        self.tokens: list[tuple[str, str]] = []
+        self.ranked: list[tuple] = []
+        for suggestion in suggestions:
+            key = normalize_text(suggestion.text_input)
+            self.variants.setdefault(key, {})[suggestion.text_input] = suggestion
+        for key in self.variants:
+            entry = self.entries[key] = self._merge(key)
+            self.spaced[key] = " " + " ".join(tokenize(key))
+            self.ranks[key] = _rank(entry, key)
+            self.tokens.extend((t, key) for t in set(tokenize(key)))
+        self.tokens.sort()
+        self.ranked = sorted(self.ranks.values())
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _merge(self, key: str) -> Suggestion:
+        """The latest variant's text and macros, with the uses of all variants."""
+        variants = self.variants[key].values()
+        latest = max(variants, key=lambda s: s.last_used_at)
+        return replace(latest, use_count=sum(s.use_count for s in variants))
+
+    def _unrank(self, key: str):
+        rank = self.ranks.pop(key)
+        i = bisect_left(self.ranked, rank)
+        if i < len(self.ranked) and self.ranked[i] == rank:
+            del self.ranked[i]
+
+    def _set_entry(self, key: str):
+        entry = self.entries[key] = self._merge(key)
+        rank = self.ranks[key] = _rank(entry, key)
+        insort(self.ranked, rank)
+
+    def upsert(self, suggestion: Suggestion):
+        key = normalize_text(suggestion.text_input)
+        if key in self.variants:
+            self._unrank(key)
+        else:
+            self.variants[key] = {}
+            self.spaced[key] = " " + " ".join(tokenize(key))
+            for token in set(tokenize(key)):
+                insort(self.tokens, (token, key))
+        self.variants[key][suggestion.text_input] = suggestion
+        self._set_entry(key)
+
+    def remove(self, text_input: str):
+        key = normalize_text(text_input)
+        variants = self.variants.get(key)
+        if variants is None or variants.pop(text_input, None) is None:
+            return
+        self._unrank(key)
+        if variants:
+            self._set_entry(key)
+            return
+        del self.variants[key], self.entries[key]
+        del self.spaced[key]
+        for token in set(tokenize(key)):
+            i = bisect_left(self.tokens, (token, key))
+            if i < len(self.tokens) and self.tokens[i] == (token, key):
+                del self.tokens[i]
+
+    def _range(self, prefix: str) -> tuple[int, int]:
+        end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return bisect_left(self.tokens, (prefix,)), bisect_left(self.tokens, (end,))
+
+    def search(self, q: str, limit: int) -> list[Suggestion]:
+        """Texts where every token of ``q`` prefixes a word, most used then most recent first."""
+        prefixes = tokenize(q)
+        if not prefixes:
+            return []
+        ranges = sorted((hi - lo, lo, hi) for p in prefixes for lo, hi in [self._range(p)])
+        _, lo, hi = ranges[0]
+        needles = [" " + p for p in prefixes]
+
+        def matches(key: str) -> bool:
+            spaced = self.spaced.get(key)
+            return spaced is not None and all(map(spaced.__contains__, needles))
+
+        if hi - lo <= _SCAN_MATCHES:
+            # Few texts carry the narrowest prefix: rank just those
+            candidates = {key for _, key in self.tokens[lo:hi]}
+            ranks = filter(None, map(self.ranks.get, filter(matches, candidates)))
+            keys = [key for _, _, key in heapq.nsmallest(limit, ranks)]
+        else:
+            # Most texts match: walk the ranking until enough of them do
+            keys, start = [], 0
+            while len(keys) < limit and (chunk := self.ranked[start : start + _WALK_CHUNK]):
+                for _, _, key in chunk:
+                    # A writer moving a text between two chunks can show it twice
+                    if matches(key) and key not in keys:
+                        keys.append(key)
+                        if len(keys) == limit:
+                            break
+                start += _WALK_CHUNK
+        return [s for s in map(self.entries.get, keys) if s is not None]
+
+
+# Prefixes carried by more (token, text) pairs than this are answered by walking
+# the ranking instead of ranking every match
+_SCAN_MATCHES = 2000
+_WALK_CHUNK = 256
+
+_lock = threading.Lock()
+_indexes: OrderedDict[str, UserIndex] = OrderedDict()
+# Bumped on every committed change per user, so a load that raced a write is not cached
+_generations: dict[str, int] = {}
+_size = 0
+_stats = {"hits": 0, "loads": 0, "evictions": 0}
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "users": len(_indexes), "entries": _size}
+
+
+def _load(user_id: str) -> list[Suggestion]:
+    with SessionLocal() as db:
+        rows = db.query(MealSearchEntry).filter(MealSearchEntry.user_id == user_id).all()
+        return [
+            Suggestion(
+                text_input=r.text_input,
+                calories=r.calories,
+                protein=r.protein,
+                carbs=r.carbs,
+                fat=r.fat,
+                sugar=r.sugar,
+                last_used_at=r.last_used_at,
+                use_count=r.use_count,
+            )
+            for r in rows
+        ]
+
+
+def _install(user_id: str, index: UserIndex):
+    global _size
+    _indexes[user_id] = index
+    _size += len(index)
+    while _size > AUTOCOMPLETE_MAX_ENTRIES and len(_indexes) > 1:
+        _, evicted = _indexes.popitem(last=False)
+        _size -= len(evicted)
+        _stats["evictions"] += 1
+
+
+async def search(user_id: str, q: str, limit: int = 10) -> list[Suggestion]:
+    with _lock:
+        index = _indexes.get(user_id)
+        if index is not None:
+            _indexes.move_to_end(user_id)
+            _stats["hits"] += 1
+        generation = _generations.get(user_id, 0)
+
+    if index is None:
+        index = UserIndex(await run_sync(_load, user_id))
+        with _lock:
+            _stats["loads"] += 1
+            if _generations.get(user_id, 0) == generation and user_id not in _indexes:
+                _install(user_id, index)
+    # Writers only hold the lock for their own update, not for searches
+    return index.search(q, limit)
+
+
+def _apply(user_id: str, text_input: str, values: dict | None):
+    global _size
+    _generations[user_id] = _generations.get(user_id, 0) + 1
+    index = _indexes.get(user_id)
+    if index is None:
+        return
+    _size -= len(index)
+    if values is None:
+        index.remove(text_input)
+    else:
+        index.upsert(Suggestion(text_input=text_input, **values))
+    _size += len(index)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    updates = session.info.pop(PENDING_UPDATES_KEY, None)
+    if not updates:
+        return
+    with _lock:
+        for user_id, text_input, values in updates:
+            _apply(user_id, text_input, values)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session):
+    session.info.pop(PENDING_UPDATES_KEY, None)
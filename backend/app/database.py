@@ -1,38 +1,138 @@
+import asyncio
+import logging
 import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Any
 
 from sqlalchemy import create_engine, event
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = Path(os.environ.get("DB_PATH", Path(__file__).resolve().parent.parent / "brotein.db"))
 
+# All blocking SQLite work runs on this bounded pool so the event loop stays free
+# for in-flight extractions and other requests.
+DB_WORKERS = int(os.environ.get("DB_WORKERS", "4"))
+# Connections beyond one per worker, for streamed responses (history, export) that
+# keep a cursor open between chunks
+DB_POOL_OVERFLOW = int(os.environ.get("DB_POOL_OVERFLOW", "16"))
+
+# SQLite performance profile applied to every new connection
+DB_JOURNAL_MODE = os.environ.get("DB_JOURNAL_MODE", "WAL")
+DB_SYNCHRONOUS = os.environ.get("DB_SYNCHRONOUS", "NORMAL")
+DB_MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE = int(os.environ.get("DB_CACHE_SIZE", "-65536"))  # negative = KiB
+DB_TEMP_STORE = os.environ.get("DB_TEMP_STORE", "MEMORY")
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_MAINTENANCE_INTERVAL = float(os.environ.get("DB_MAINTENANCE_INTERVAL", "300"))
+
 
 class Base(DeclarativeBase):
     pass
 
 
-engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
+# Only executor threads check out connections, and no session holds one across an
+# await (see AsyncDB), so one per worker covers everything but streamed responses
+engine = create_engine(
+    f"sqlite:///{DB_PATH}",
+    connect_args={"check_same_thread": False},
+    pool_size=DB_WORKERS,
+    max_overflow=DB_POOL_OVERFLOW,
+)
 
 
 @event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute(f"PRAGMA journal_mode={DB_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={DB_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA temp_store={DB_TEMP_STORE}")
+    cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
     cursor.close()
 
 
 SessionLocal = sessionmaker(bind=engine)
 
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+
+
+async def _execute[T](op: str, call: Callable[[], T]) -> T:
+    loop = asyncio.get_running_loop()
+    # Includes the wait for a free executor thread, which is part of the cost
+    with metrics.span("db", op=op):
+        return await loop.run_in_executor(_executor, call)
+
+
+async def run_sync[T](fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking callable on the database executor."""
+    return await _execute(getattr(fn, "__name__", "call"), partial(fn, *args, **kwargs))
+
+
+class AsyncDB:
+    """Request-scoped handle that runs every Session operation on the DB executor.
+
+    Calls from one request are awaited sequentially, so the wrapped Session is
+    never used from two threads at the same time. The Session is closed after
+    every call, which returns its connection to the pool: a request waiting on
+    an extraction holds no connection. Returned objects stay readable, detached
+    with the attributes they had loaded.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run[T](self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call ``fn(session, *args, **kwargs)`` on the DB executor."""
+        return await _execute(
+            getattr(fn, "__name__", "call"), partial(self._call, fn, *args, **kwargs)
+        )
+
+    def _call[T](self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        try:
+            return fn(self.session, *args, **kwargs)
+        finally:
+            self.session.close()
+
 
 def init_db():
     from app import db_models  # noqa: F401 — register models before create_all
+    from app.migrations import run_migrations
+
+    with engine.begin() as conn:
+        Base.metadata.create_all(bind=conn)
+        run_migrations(conn)
+
+
+def run_maintenance():
+    """Checkpoint the WAL and let SQLite refresh its query planner statistics."""
+    with engine.connect() as conn:
+        if DB_JOURNAL_MODE.upper() == "WAL":
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)")
+        conn.exec_driver_sql("PRAGMA optimize")
+
 
-    Base.metadata.create_all(bind=engine)
+async def maintenance_loop():
+    """Run :func:`run_maintenance` every ``DB_MAINTENANCE_INTERVAL`` seconds."""
+    while True:
+        await asyncio.sleep(DB_MAINTENANCE_INTERVAL)
+        try:
+            await run_sync(run_maintenance)
+        except Exception:
+            logger.exception("Database maintenance failed")
 
 
-def get_db():
-    db = SessionLocal()
+async def get_db():
+    db = AsyncDB(SessionLocal())
     try:
         yield db
     finally:
-        db.close()
+        await run_sync(db.session.close)
@@ -1,4 +1,16 @@
-from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+)
 
 from app.database import Base
 
@@ -10,12 +22,23 @@ class User(Base):
     created_at = Column(DateTime, nullable=False)
 
 
+def _text_key(context) -> str | None:
+    # Deferred: app.openai_service imports this module through extraction_cache
+    from app.openai_service import normalize_text
+
+    text_input = context.get_current_parameters().get("text_input")
+    return normalize_text(text_input) or None
+
+
 class Meal(Base):
     __tablename__ = "meals"
     id = Column(String, primary_key=True)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     meal_date = Column(Date, nullable=False)
     text_input = Column(String, nullable=True)
+    # normalize_text(text_input), for indexed exact-match history lookups; code
+    # that changes text_input on an existing row must update it too
+    text_key = Column(String, nullable=True, default=_text_key)
     calories = Column(Integer, nullable=False, default=0)
     protein = Column(Float, nullable=False, default=0)
     carbs = Column(Float, nullable=False, default=0)
@@ -23,6 +46,12 @@ class Meal(Base):
     sugar = Column(Float, nullable=False, default=0)
     created_at = Column(DateTime, nullable=False)
 
+    __table_args__ = (
+        Index("ix_meals_user_date_created_id", "user_id", "meal_date", "created_at", "id"),
+        Index("ix_meals_user_text_created", "user_id", "text_input", "created_at"),
+        Index("ix_meals_user_text_key_created", "user_id", "text_key", "created_at"),
+    )
+
 
 class Goal(Base):
     __tablename__ = "goals"
@@ -33,3 +62,74 @@ class Goal(Base):
     fat_goal = Column(Float, nullable=False)
     sugar_goal = Column(Float, nullable=False)
     updated_at = Column(DateTime, nullable=False)
+
+
+class DailyTotal(Base):
+    """Per-day macro sums, maintained in the same transaction as every meal write."""
+
+    __tablename__ = "daily_totals"
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    meal_date = Column(Date, primary_key=True)
+    meal_count = Column(Integer, nullable=False, default=0)
+    calories = Column(Integer, nullable=False, default=0)
+    protein = Column(Float, nullable=False, default=0)
+    carbs = Column(Float, nullable=False, default=0)
+    fat = Column(Float, nullable=False, default=0)
+    sugar = Column(Float, nullable=False, default=0)
+
+
+class ExtractionCacheEntry(Base):
+    __tablename__ = "extraction_cache"
+    key = Column(String, primary_key=True)
+    calories = Column(Integer, nullable=False)
+    protein = Column(Float, nullable=False)
+    carbs = Column(Float, nullable=False)
+    fat = Column(Float, nullable=False)
+    sugar = Column(Float, nullable=False)
+    description = Column(Text, nullable=False, default="")
+    created_at = Column(DateTime, nullable=False)
+    last_used_at = Column(DateTime, nullable=False, index=True)
+
+
+class ExtractionJob(Base):
+    """Input and state of a background extraction for a placeholder meal row."""
+
+    __tablename__ = "extraction_jobs"
+    meal_id = Column(String, ForeignKey("meals.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    text_input = Column(String, nullable=True)
+    image = Column(LargeBinary, nullable=True)
+    status = Column(String, nullable=False, index=True)
+    error = Column(Text, nullable=False, default="")
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+
+class IdempotencyRecord(Base):
+    """Stored response for a request carrying an ``Idempotency-Key`` header."""
+
+    __tablename__ = "idempotency_keys"
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=False)
+    body = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class MealSearchEntry(Base):
+    """Latest macros per distinct meal text; content table for the ``meal_search`` FTS5 index."""
+
+    __tablename__ = "meal_search_entries"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    text_input = Column(String, nullable=False)
+    calories = Column(Integer, nullable=False)
+    protein = Column(Float, nullable=False)
+    carbs = Column(Float, nullable=False)
+    fat = Column(Float, nullable=False)
+    sugar = Column(Float, nullable=False)
+    last_used_at = Column(DateTime, nullable=False)
+    use_count = Column(Integer, nullable=False)
+
+    __table_args__ = (UniqueConstraint("user_id", "text_input"),)
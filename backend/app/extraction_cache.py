@@ -0,0 +1,98 @@
+"""Persistent cache of successful extractions, stored in the app's SQLite database.
+
+Entries expire ``EXTRACTION_CACHE_TTL`` seconds after they are written, and the
+least recently used ones are evicted once the table holds more than
+``EXTRACTION_CACHE_MAX_ENTRIES`` rows. Keys are built by the caller and should
+already include the prompt/model version.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+
+from app.database import SessionLocal, run_sync
+from app.db_models import ExtractionCacheEntry
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_CACHE_ENABLED = os.environ.get("EXTRACTION_CACHE_ENABLED", "1") == "1"
+EXTRACTION_CACHE_TTL = float(os.environ.get("EXTRACTION_CACHE_TTL", str(30 * 24 * 3600)))
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.environ.get("EXTRACTION_CACHE_MAX_ENTRIES", "10000"))
+
+_FIELDS = ("calories", "protein", "carbs", "fat", "sugar", "description")
+
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+
+def stats() -> dict:
+    return dict(_stats)
+
+
+def _get(key: str) -> dict | None:
+    with SessionLocal() as db:
+        now = datetime.now()
+        entry = db.get(ExtractionCacheEntry, key)
+        if entry is None:
+            return None
+        if entry.created_at < now - timedelta(seconds=EXTRACTION_CACHE_TTL):
+            db.delete(entry)
+            db.commit()
+            return None
+        entry.last_used_at = now
+        fields = {f: getattr(entry, f) for f in _FIELDS}
+        db.commit()
+        return fields
+
+
+def _put(key: str, fields: dict) -> int:
+    with SessionLocal() as db:
+        now = datetime.now()
+        db.merge(ExtractionCacheEntry(key=key, created_at=now, last_used_at=now, **fields))
+
+        expired = db.execute(
+            delete(ExtractionCacheEntry).where(
+                ExtractionCacheEntry.created_at < now - timedelta(seconds=EXTRACTION_CACHE_TTL)
+            )
+        ).rowcount
+        overflow = db.scalar(select(func.count()).select_from(ExtractionCacheEntry))
+        overflow -= EXTRACTION_CACHE_MAX_ENTRIES
+        evicted = 0
+        if overflow > 0:
+            oldest = (
+                select(ExtractionCacheEntry.key)
+                .order_by(ExtractionCacheEntry.last_used_at)
+                .limit(overflow)
+            )
+            evicted = db.execute(
+                delete(ExtractionCacheEntry).where(ExtractionCacheEntry.key.in_(oldest))
+            ).rowcount
+        db.commit()
+        return expired + evicted
+
+
+async def get(key: str) -> dict | None:
+    """Return the cached extraction fields for ``key``, or None on a miss."""
+    if not EXTRACTION_CACHE_ENABLED:
+        return None
+    try:
+        fields = await run_sync(_get, key)
+    except Exception:
+        logger.exception("Extraction cache lookup failed")
+        fields = None
+    _stats["hits" if fields else "misses"] += 1
+    return fields
+
+
+async def put(key: str, fields: dict):
+    """Store extraction fields under ``key``, evicting expired and LRU entries."""
+    if not EXTRACTION_CACHE_ENABLED:
+        return
+    try:
+        evicted = await run_sync(_put, key, {f: fields[f] for f in _FIELDS})
+    except Exception:
+        logger.exception("Extraction cache write failed")
+        return
+    _stats["writes"] += 1
+    _stats["evictions"] += evicted
@@ -0,0 +1,149 @@
+"""Admission control for outbound extraction calls.
+
+Every OpenAI attempt runs inside :meth:`ExtractionScheduler.slot`, which caps
+the number of calls in flight, spends from requests-per-minute and
+tokens-per-minute budgets, and hands free slots to waiting users in
+round-robin order so one heavy user cannot starve the rest. Each limit is off
+(0) unless configured; set them to the account's provider limits.
+"""
+
+import asyncio
+import math
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+import openai
+
+EXTRACTION_MAX_IN_FLIGHT = int(os.environ.get("EXTRACTION_MAX_IN_FLIGHT", "0"))
+EXTRACTION_RPM = float(os.environ.get("EXTRACTION_RPM", "0"))
+EXTRACTION_TPM = float(os.environ.get("EXTRACTION_TPM", "0"))
+EXTRACTION_BACKOFF_BASE = float(os.environ.get("EXTRACTION_BACKOFF_BASE", "1.0"))
+EXTRACTION_BACKOFF_MAX = float(os.environ.get("EXTRACTION_BACKOFF_MAX", "30"))
+
+
+class TokenBucket:
+    """Budget that refills continuously at ``per_minute`` units per minute; 0 is unlimited."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.available = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self, amount: float):
+        if not self.rate:
+            return
+        # A single request larger than the whole budget waits for a full bucket
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.available >= amount:
+                self.available -= amount
+                return
+            await asyncio.sleep((amount - self.available) / self.rate)
+
+
+class ExtractionScheduler:
+    def __init__(self, max_in_flight: int, rpm: float, tpm: float):
+        self._free = max_in_flight or math.inf
+        self._waiting: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._stats = {
+            "in_flight": 0,
+            "admitted": 0,
+            "queued": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "throttled": 0,
+        }
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "queue_depth": sum(1 for q in self._waiting.values() for fut in q if not fut.done()),
+        }
+
+    def _release(self):
+        # Hand the slot to the next waiting user in round-robin order
+        while self._waiting:
+            user_id, queue = next(iter(self._waiting.items()))
+            fut = queue.popleft()
+            if queue:
+                self._waiting.move_to_end(user_id)
+            else:
+                del self._waiting[user_id]
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._free += 1
+
+    async def _acquire(self, user_id: str):
+        if self._free > 0 and not self._waiting:
+            self._free -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(user_id, deque()).append(fut)
+        self._stats["queued"] += 1
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # Granted just before the cancellation landed; pass the slot on
+            if fut.done() and not fut.cancelled():
+                self._release()
+            raise
+
+    @asynccontextmanager
+    async def slot(self, user_id: str, estimated_tokens: int):
+        """Wait for a fair share of the in-flight and rate budgets, then run the body."""
+        started = time.monotonic()
+        await self._acquire(user_id)
+        try:
+            await self._requests.take(1)
+            await self._tokens.take(estimated_tokens)
+            waited = time.monotonic() - started
+            self._stats["admitted"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+            self._stats["in_flight"] += 1
+            try:
+                yield
+            finally:
+                self._stats["in_flight"] -= 1
+        finally:
+            self._release()
+
+    def backoff_delay(self, exc: Exception, attempt: int) -> float | None:
+        """Seconds to wait before retrying after ``exc``, or None if it is not transient.
+
+        Honours ``Retry-After``/``retry-after-ms`` when the provider sends one,
+        otherwise uses exponential backoff with full jitter.
+        """
+        if isinstance(exc, openai.APIStatusError):
+            if exc.status_code != 429 and exc.status_code < 500:
+                return None
+            if exc.status_code == 429:
+                self._stats["throttled"] += 1
+            headers = exc.response.headers
+            try:
+                if "retry-after-ms" in headers:
+                    return float(headers["retry-after-ms"]) / 1000
+                if "retry-after" in headers:
+                    return float(headers["retry-after"])
+            except ValueError:
+                pass
+        elif not isinstance(exc, openai.APIConnectionError):
+            return None
+        cap = min(EXTRACTION_BACKOFF_MAX, EXTRACTION_BACKOFF_BASE * 2**attempt)
+        return random.uniform(0, cap)
+
+
+scheduler = ExtractionScheduler(EXTRACTION_MAX_IN_FLIGHT, EXTRACTION_RPM, EXTRACTION_TPM)
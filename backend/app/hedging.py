@@ -0,0 +1,115 @@
+"""Hedged model calls for extraction tail latency.
+
+When enabled, :func:`race` starts a second identical call if the first has not
+finished within the ``EXTRACTION_HEDGE_PERCENTILE`` latency recently observed
+for that model. The first valid answer wins and the other call is cancelled.
+Hedges spend from a budget that grows by ``EXTRACTION_HEDGE_MAX_RATE`` per
+call (capped at ``EXTRACTION_HEDGE_BURST``), so at most that fraction of calls
+is ever duplicated.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+EXTRACTION_HEDGE_ENABLED = os.environ.get("EXTRACTION_HEDGE_ENABLED", "0") == "1"
+EXTRACTION_HEDGE_PERCENTILE = float(os.environ.get("EXTRACTION_HEDGE_PERCENTILE", "95"))
+# Delay used until a model has EXTRACTION_HEDGE_MIN_SAMPLES observed latencies
+EXTRACTION_HEDGE_DEFAULT_DELAY = float(os.environ.get("EXTRACTION_HEDGE_DEFAULT_DELAY", "8"))
+EXTRACTION_HEDGE_MIN_DELAY = float(os.environ.get("EXTRACTION_HEDGE_MIN_DELAY", "0.5"))
+EXTRACTION_HEDGE_MIN_SAMPLES = int(os.environ.get("EXTRACTION_HEDGE_MIN_SAMPLES", "20"))
+EXTRACTION_HEDGE_WINDOW = int(os.environ.get("EXTRACTION_HEDGE_WINDOW", "200"))
+EXTRACTION_HEDGE_MAX_RATE = float(os.environ.get("EXTRACTION_HEDGE_MAX_RATE", "0.05"))
+EXTRACTION_HEDGE_BURST = float(os.environ.get("EXTRACTION_HEDGE_BURST", "3"))
+
+_latencies: dict[str, deque[float]] = {}
+_budget = EXTRACTION_HEDGE_BURST
+_stats = {
+    "calls": 0,
+    "hedged": 0,
+    "hedge_wins": 0,
+    "primary_wins": 0,
+    "both_failed": 0,
+    "rate_limited": 0,
+    "extra_estimated_tokens": 0,
+}
+
+
+def stats() -> dict:
+    return {
+        **_stats,
+        "enabled": EXTRACTION_HEDGE_ENABLED,
+        "hedge_rate": _stats["hedged"] / _stats["calls"] if _stats["calls"] else 0.0,
+        "delay_seconds": {model: delay(model) for model in _latencies},
+    }
+
+
+def delay(model: str) -> float:
+    """Seconds to wait on a call to ``model`` before hedging it."""
+    samples = _latencies.get(model)
+    if not samples or len(samples) < EXTRACTION_HEDGE_MIN_SAMPLES:
+        return EXTRACTION_HEDGE_DEFAULT_DELAY
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * EXTRACTION_HEDGE_PERCENTILE / 100))
+    return max(EXTRACTION_HEDGE_MIN_DELAY, ordered[index])
+
+
+def _record(model: str, seconds: float):
+    _latencies.setdefault(model, deque(maxlen=EXTRACTION_HEDGE_WINDOW)).append(seconds)
+
+
+def _take_budget() -> bool:
+    global _budget
+    if _budget >= 1:
+        _budget -= 1
+        return True
+    _stats["rate_limited"] += 1
+    return False
+
+
+async def race[R](
+    model: str,
+    primary: Callable[[], Awaitable[R]],
+    hedge: Callable[[], Awaitable[R]],
+    valid: Callable[[R], bool],
+    estimated_tokens: int = 0,
+) -> R:
+    """Await ``primary()``, racing it against ``hedge()`` if it runs past the hedge delay.
+
+    Returns the first result accepted by ``valid``; if neither is, returns (or
+    raises) the primary's outcome. The losing call is cancelled.
+    """
+    global _budget
+    if not EXTRACTION_HEDGE_ENABLED:
+        return await primary()
+    _stats["calls"] += 1
+    _budget = min(EXTRACTION_HEDGE_BURST, _budget + EXTRACTION_HEDGE_MAX_RATE)
+
+    started = time.monotonic()
+    first = asyncio.ensure_future(primary())
+    # A primary cut short by its hedge still records how long it had run: a lower bound
+    first.add_done_callback(lambda _: _record(model, time.monotonic() - started))
+    second = None
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay(model))
+        if done or not _take_budget():
+            return await first
+
+        _stats["hedged"] += 1
+        _stats["extra_estimated_tokens"] += estimated_tokens
+        second = asyncio.ensure_future(hedge())
+        pending = {first, second}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None and valid(task.result()):
+                    _stats["hedge_wins" if task is second else "primary_wins"] += 1
+                    return task.result()
+        _stats["both_failed"] += 1
+        return first.result()
+    finally:
+        for task in (first, second):
+            if task is not None and not task.done():
+                task.cancel()
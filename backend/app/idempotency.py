@@ -0,0 +1,136 @@
+"""``Idempotency-Key`` support for endpoints that create meals.
+
+The first request with a key runs normally and its JSON response is stored
+for ``IDEMPOTENCY_TTL`` seconds; repeats get the stored response back without
+re-running the handler. A repeat that arrives while the first is still running
+waits for it instead of starting a second one. Reusing a key for a different
+request body is rejected with 422. Failed requests are not stored, so a client
+can retry them with the same key.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete
+
+from app import metrics
+from app.database import SessionLocal, run_sync
+from app.db_models import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", str(24 * 3600)))
+
+_in_flight: dict[str, asyncio.Future] = {}
+
+_stats = {"replayed": 0, "joined": 0, "stored": 0}
+
+
+def stats() -> dict:
+    return {**_stats, "in_flight": len(_in_flight)}
+
+
+def fingerprint(*parts) -> str:
+    """Hash the parts of a request that must match for a key to be replayed."""
+    return hashlib.sha256("\0".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def _load(key: str) -> IdempotencyRecord | None:
+    with SessionLocal() as db:
+        record = db.get(IdempotencyRecord, key)
+        if record is None or record.expires_at < datetime.now():
+            return None
+        db.expunge(record)
+        return record
+
+
+def _store(key: str, request_fingerprint: str, status_code: int, body: str):
+    with SessionLocal() as db:
+        now = datetime.now()
+        db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at < now))
+        db.merge(
+            IdempotencyRecord(
+                key=key,
+                fingerprint=request_fingerprint,
+                status_code=status_code,
+                body=body,
+                created_at=now,
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL),
+            )
+        )
+        db.commit()
+
+
+def _replay(record: IdempotencyRecord, request_fingerprint: str) -> Response:
+    if record.fingerprint != request_fingerprint:
+        raise HTTPException(
+            status_code=422, detail="Idempotency-Key was already used for a different request"
+        )
+    return Response(
+        content=record.body, status_code=record.status_code, media_type="application/json"
+    )
+
+
+async def run(
+    key: str | None,
+    scope: str,
+    request_fingerprint: str,
+    produce: Callable[[], Awaitable[BaseModel | list[BaseModel] | JSONResponse]],
+) -> BaseModel | list[BaseModel] | Response:
+    """Run ``produce`` at most once per ``(scope, key)`` and replay its response."""
+    if not key:
+        return await produce()
+
+    full_key = f"{scope}:{key}"
+    while (pending := _in_flight.get(full_key)) is not None:
+        _stats["joined"] += 1
+        try:
+            record = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # The first request was cancelled, not this one: take its place
+            if pending.cancelled() and not asyncio.current_task().cancelling():
+                continue
+            raise
+        return _replay(record, request_fingerprint)
+
+    # Registered before the lookup awaits, so a repeat arriving meanwhile waits
+    # for this request instead of also finding no record and running produce()
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[full_key] = future
+    result = None
+    try:
+        record = await run_sync(_load, full_key)
+        if record is None:
+            result = await produce()
+            with metrics.span("serialize"):
+                if isinstance(result, Response):
+                    status_code, body = result.status_code, bytes(result.body).decode()
+                elif isinstance(result, list):
+                    status_code, body = 200, f"[{','.join(m.model_dump_json() for m in result)}]"
+                else:
+                    status_code, body = 200, result.model_dump_json()
+            await run_sync(_store, full_key, request_fingerprint, status_code, body)
+            _stats["stored"] += 1
+            record = IdempotencyRecord(
+                fingerprint=request_fingerprint, status_code=status_code, body=body
+            )
+        else:
+            _stats["replayed"] += 1
+        future.set_result(record)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        future.set_exception(exc)
+        future.exception()  # waiters re-raise it; don't warn when there are none
+        raise
+    finally:
+        del _in_flight[full_key]
+    return result if result is not None else _replay(record, request_fingerprint)
@@ -0,0 +1,128 @@
+"""Upload handling and preprocessing for meal images.
+
+Meal uploads whose declared ``Content-Length`` exceeds ``IMAGE_MAX_UPLOAD_BYTES``
+(plus room for the other form fields) are rejected before the body is read;
+see :func:`declared_too_large`. Otherwise Starlette spools the multipart body
+before the handler runs, and :func:`read_upload` enforces the limit on the
+spooled file, which also covers chunked requests. Images are then
+rotated according to their EXIF orientation, downscaled so the longest side is
+at most ``IMAGE_MAX_DIMENSION`` (the model tiles larger images down anyway) and
+re-encoded as ``IMAGE_FORMAT`` with Pillow. Should Pillow be missing from an
+environment, the original bytes are passed through with their sniffed MIME type.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+from dataclasses import dataclass
+
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # declared dependency; keep uploads working without it
+    Image = None
+    logger.warning("Pillow is not installed; images are sent to the model unprocessed")
+
+IMAGE_MAX_UPLOAD_BYTES = int(os.environ.get("IMAGE_MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+IMAGE_MAX_DIMENSION = int(os.environ.get("IMAGE_MAX_DIMENSION", "1536"))
+IMAGE_FORMAT = os.environ.get("IMAGE_FORMAT", "JPEG").upper()
+IMAGE_QUALITY = int(os.environ.get("IMAGE_QUALITY", "85"))
+
+_CHUNK_SIZE = 64 * 1024
+# Multipart boundaries, part headers and the text fields sent alongside the image
+_FORM_OVERHEAD = 64 * 1024
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+_stats = {"images": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    original_size: int
+
+
+def stats() -> dict:
+    return dict(_stats)
+
+
+def sniff_mime(data: bytes) -> str:
+    """Guess an image's MIME type from its magic bytes, defaulting to JPEG."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "image/jpeg"
+
+
+def declared_too_large(content_length: str | None, limit: int = IMAGE_MAX_UPLOAD_BYTES) -> bool:
+    """Whether a request's ``Content-Length`` already rules out an image within ``limit``."""
+    try:
+        return int(content_length or 0) > limit + _FORM_OVERHEAD
+    except ValueError:
+        return False
+
+
+def _file_digest(file) -> str:
+    digest = hashlib.file_digest(file, "sha256").hexdigest()
+    file.seek(0)
+    return digest
+
+
+async def content_hash(upload: UploadFile) -> str:
+    """SHA-256 of an already spooled upload, leaving it rewound for reading."""
+    return await asyncio.to_thread(_file_digest, upload.file)
+
+
+async def read_upload(upload: UploadFile, limit: int = IMAGE_MAX_UPLOAD_BYTES) -> bytes:
+    """Read an already spooled upload, raising ImageTooLargeError once it exceeds ``limit``."""
+    buffer = bytearray()
+    while chunk := await upload.read(_CHUNK_SIZE):
+        buffer += chunk
+        if len(buffer) > limit:
+            raise ImageTooLargeError(f"Image exceeds {limit} bytes")
+    return bytes(buffer)
+
+
+def prepare(data: bytes) -> PreparedImage:
+    """Shrink and re-encode an image for the vision model. CPU-bound; run off the event loop."""
+    prepared = PreparedImage(data=data, mime_type=sniff_mime(data), original_size=len(data))
+    if Image is not None:
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+                if img.mode not in ("RGB", "L"):
+                    img = img.convert("RGB")
+                out = io.BytesIO()
+                img.save(out, format=IMAGE_FORMAT, quality=IMAGE_QUALITY)
+            # Keep the original when re-encoding would not make it smaller
+            if out.tell() < len(data):
+                prepared.data = out.getvalue()
+                prepared.mime_type = _MIME_TYPES.get(IMAGE_FORMAT, "image/jpeg")
+        except Exception:
+            logger.exception("Image preprocessing failed; sending original bytes")
+
+    _stats["images"] += 1
+    _stats["bytes_in"] += prepared.original_size
+    _stats["bytes_out"] += len(prepared.data)
+    logger.info(
+        "Prepared image: %d -> %d bytes (%s)",
+        prepared.original_size,
+        len(prepared.data),
+        prepared.mime_type,
+    )
+    return prepared
@@ -0,0 +1,184 @@
+"""In-process worker pool for asynchronous meal extraction.
+
+``POST /api/meal`` in async mode stores a placeholder meal plus an
+``extraction_jobs`` row and returns immediately. Workers started from the
+lifespan run :func:`extract_macros` for queued jobs, fill in the meal and
+notify any status subscribers. Jobs left pending by a restart are re-queued
+from the database on startup.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app import response_cache, search
+from app.database import SessionLocal, run_sync
+from app.db_models import ExtractionJob, Meal
+from app.openai_service import ExtractionResult, extract_macros, normalize_text
+from app.totals import apply_meal
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", "4"))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+TERMINAL = (DONE, FAILED)
+
+_queue: asyncio.Queue[str] = asyncio.Queue()
+_workers: list[asyncio.Task] = []
+_subscribers: dict[str, set[asyncio.Queue]] = {}
+
+
+def add_job(db: Session, meal: Meal, text: str | None, image_bytes: bytes | None):
+    """Insert a placeholder meal and its pending job in one transaction.
+
+    The meal enters search in :func:`_finish`, once it has real macros.
+    """
+    now = datetime.now()
+    db.add(meal)
+    apply_meal(db, meal)
+    db.add(
+        ExtractionJob(
+            meal_id=meal.id,
+            user_id=meal.user_id,
+            text_input=text,
+            image=image_bytes,
+            status=PENDING,
+            error="",
+            created_at=now,
+            updated_at=now,
+        )
+    )
+    db.commit()
+    db.refresh(meal)
+
+
+def get_job(db: Session, meal_id: str) -> tuple[ExtractionJob | None, Meal | None]:
+    return db.get(ExtractionJob, meal_id), db.get(Meal, meal_id)
+
+
+def _claim(meal_id: str) -> tuple[str | None, bytes | None, str] | None:
+    with SessionLocal() as db:
+        job = db.get(ExtractionJob, meal_id)
+        if job is None or job.status in TERMINAL:
+            return None
+        job.status = RUNNING
+        job.updated_at = datetime.now()
+        db.commit()
+        return job.text_input, job.image, job.user_id
+
+
+def _finish(meal_id: str, result: ExtractionResult) -> tuple[str, str | None]:
+    with SessionLocal() as db:
+        job = db.get(ExtractionJob, meal_id)
+        meal = db.get(Meal, meal_id)
+        if job is None or meal is None:
+            return FAILED, None
+        apply_meal(db, meal, -1)
+        placeholder_text = meal.text_input
+        meal.text_input = result.description or job.text_input
+        meal.text_key = normalize_text(meal.text_input) or None
+        meal.calories = result.calories
+        meal.protein = result.protein
+        meal.carbs = result.carbs
+        meal.fat = result.fat
+        meal.sugar = result.sugar
+        apply_meal(db, meal)
+        job.status = FAILED if result.error else DONE
+        search.refresh_entry(db, meal.user_id, placeholder_text)
+        search.refresh_entry(db, meal.user_id, meal.text_input)
+        job.error = result.error
+        job.image = None
+        job.updated_at = datetime.now()
+        db.commit()
+        return job.status, meal.user_id
+
+
+def _pending_ids() -> list[str]:
+    with SessionLocal() as db:
+        rows = (
+            db.query(ExtractionJob.meal_id)
+            .filter(ExtractionJob.status.in_([PENDING, RUNNING]))
+            .order_by(ExtractionJob.created_at)
+            .all()
+        )
+        return [row[0] for row in rows]
+
+
+def subscribe(meal_id: str) -> asyncio.Queue:
+    """Return a queue that receives the job's status on every change."""
+    queue: asyncio.Queue = asyncio.Queue()
+    _subscribers.setdefault(meal_id, set()).add(queue)
+    return queue
+
+
+def unsubscribe(meal_id: str, queue: asyncio.Queue):
+    listeners = _subscribers.get(meal_id)
+    if listeners is not None:
+        listeners.discard(queue)
+        if not listeners:
+            del _subscribers[meal_id]
+
+
+def _notify(meal_id: str, status: str):
+    for queue in _subscribers.get(meal_id, ()):
+        queue.put_nowait(status)
+
+
+async def _process(meal_id: str):
+    claimed = await run_sync(_claim, meal_id)
+    if claimed is None:
+        return
+    _notify(meal_id, RUNNING)
+    text, image_bytes, user_id = claimed
+    try:
+        result = await extract_macros(text, image_bytes, user_id=user_id)
+    except Exception as exc:
+        logger.exception("Extraction job %s crashed", meal_id)
+        result = ExtractionResult(
+            calories=0, protein=0.0, carbs=0.0, fat=0.0, sugar=0.0, error=str(exc)
+        )
+    status, user_id = await run_sync(_finish, meal_id, result)
+    if user_id:
+        response_cache.bump(user_id)
+    logger.info("Extraction job %s finished: %s", meal_id, status)
+    _notify(meal_id, status)
+
+
+async def _worker():
+    while True:
+        meal_id = await _queue.get()
+        try:
+            await _process(meal_id)
+        except Exception:
+            logger.exception("Extraction job %s failed", meal_id)
+        finally:
+            _queue.task_done()
+
+
+def submit(meal_id: str):
+    _queue.put_nowait(meal_id)
+
+
+async def start():
+    """Start the worker pool and re-queue jobs interrupted by a restart."""
+    for _ in range(EXTRACTION_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+    pending = await run_sync(_pending_ids)
+    if pending:
+        logger.info("Re-queuing %d pending extraction job(s)", len(pending))
+    for meal_id in pending:
+        submit(meal_id)
+
+
+async def stop():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -1,13 +1,28 @@
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
-from app.database import init_db
-from app.routes import daily, goals, meals, users, weekly
+from app import (
+    autocomplete,
+    extraction_cache,
+    hedging,
+    idempotency,
+    images,
+    jobs,
+    metrics,
+    nutrition,
+    openai_service,
+    response_cache,
+)
+from app.database import init_db, maintenance_loop
+from app.extraction_scheduler import scheduler
+from app.routes import daily, goals, history, meals, transfer, users, weekly
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
 
@@ -17,23 +32,93 @@ FRONTEND_DIST = Path(__file__).resolve().parent.parent.parent / "frontend" / "di
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    openai_service.init_client()
+    if nutrition.LOCAL_NUTRITION_ENABLED:
+        nutrition.load()
+    maintenance = asyncio.create_task(maintenance_loop())
+    await jobs.start()
     yield
+    await jobs.stop()
+    maintenance.cancel()
+    await openai_service.close_client()
 
 
 app = FastAPI(lifespan=lifespan)
 
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    started = time.perf_counter()
+    # An unhandled exception reaches the client as a 500; record it as one
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep the series count bounded
+        route = request.scope.get("route")
+        metrics.histogram(
+            "http_request_duration_seconds",
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        ).observe(time.perf_counter() - started)
+
+
+@app.middleware("http")
+async def limit_meal_upload(request: Request, call_next):
+    # Refuse before Starlette spools the multipart body to disk
+    if (
+        request.method == "POST"
+        and request.url.path == "/api/meal"
+        and images.declared_too_large(request.headers.get("content-length"))
+    ):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Image exceeds {images.IMAGE_MAX_UPLOAD_BYTES} bytes"},
+        )
+    return await call_next(request)
+
+
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
 
 
+@app.get("/api/stats")
+def stats():
+    return {
+        "extraction_cache": extraction_cache.stats(),
+        "extraction_scheduler": scheduler.stats(),
+        "extraction_singleflight": openai_service.singleflight_stats(),
+        "extraction_routing": openai_service.routing_stats(),
+        "extraction_tokens": openai_service.token_stats(),
+        "extraction_hedging": hedging.stats(),
+        "images": images.stats(),
+        "local_nutrition": nutrition.stats(),
+        "idempotency": idempotency.stats(),
+        "autocomplete": autocomplete.stats(),
+        "response_cache": response_cache.stats(),
+    }
+
+
+@app.get("/api/metrics")
+def prometheus_metrics():
+    """Latency histograms and the numeric /api/stats values, in Prometheus text format."""
+    return PlainTextResponse(
+        metrics.render(stats()), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 app.include_router(meals.search_router)
+app.include_router(history.router)
 app.include_router(meals.router)
 app.include_router(daily.router)
 app.include_router(weekly.router)
 app.include_router(users.router)
 app.include_router(goals.router)
+app.include_router(transfer.router)
 
 
 if FRONTEND_DIST.is_dir():
@@ -0,0 +1,120 @@
+"""In-process metrics: latency histograms, stage spans and Prometheus text export.
+
+Histograms are registered by name and label set on first use. :func:`span`
+times a block into ``stage_duration_seconds{stage=...}``; the HTTP middleware
+in :mod:`app.main` records ``http_request_duration_seconds`` per route, and
+:func:`render` serves everything at ``/api/metrics``.
+"""
+
+import bisect
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, suited to model calls
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+# Upper bounds in seconds for requests and in-process stages
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_HELP = {
+    "http_request_duration_seconds": "HTTP request latency by route, until response headers.",
+    "stage_duration_seconds": "Time spent in one stage of request handling.",
+    "openai_attempt_duration_seconds": "Latency of one model call attempt.",
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values, Prometheus style."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        cumulative, total = {}, 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts, strict=True):
+            total += count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = total
+        return {"count": self.count, "sum": round(self.sum, 6), "buckets": cumulative}
+
+
+_histograms: dict[str, dict[tuple[tuple[str, str], ...], Histogram]] = {}
+
+
+def histogram(name: str, buckets: tuple[float, ...] = REQUEST_BUCKETS, **labels) -> Histogram:
+    """The histogram registered under ``name`` and ``labels``, created on first use."""
+    series = _histograms.setdefault(name, {})
+    key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+    found = series.get(key)
+    if found is None:
+        found = series[key] = Histogram(buckets)
+    return found
+
+
+def series(name: str) -> dict[tuple[tuple[str, str], ...], Histogram]:
+    return _histograms.get(name, {})
+
+
+@contextmanager
+def span(stage: str, **labels):
+    """Time the enclosed block into ``stage_duration_seconds``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram("stage_duration_seconds", stage=stage, **labels).observe(
+            time.perf_counter() - started
+        )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _flatten(prefix: tuple[str, ...], value, out: list):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            # Histogram snapshots are exported as real histograms already
+            if k == "buckets":
+                continue
+            _flatten((*prefix, str(k)), v, out)
+    elif isinstance(value, bool | int | float):
+        out.append((prefix, float(value)))
+
+
+def render(stats: dict | None = None) -> str:
+    """Every histogram, plus the numeric leaves of ``stats`` as gauges, in Prometheus text format."""
+    lines = []
+    for name, by_labels in _histograms.items():
+        lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, h in by_labels.items():
+            total = 0
+            for bound, count in zip((*h.buckets, float("inf")), h.counts, strict=True):
+                total += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels((*key, ('le', le)))} {total}")
+            lines.append(f"{name}_sum{_labels(key)} {h.sum!r}")
+            lines.append(f"{name}_count{_labels(key)} {h.count}")
+
+    if stats:
+        gauges: list = []
+        _flatten((), stats, gauges)
+        lines.append("# HELP app_stat Values reported by /api/stats.")
+        lines.append("# TYPE app_stat gauge")
+        for path, value in gauges:
+            pairs = (("section", path[0]), ("key", ".".join(path[1:])))
+            lines.append(f"app_stat{_labels(pairs)} {value!r}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,132 @@
+"""Versioned schema migrations for existing databases.
+
+The applied version is tracked in SQLite's ``PRAGMA user_version``. Ordinary
+tables come from ``create_all``; migrations add what it cannot express for
+existing databases (indexes on old tables, backfills, FTS5 virtual tables), so
+every step must be safe to run against a freshly created schema too. A step is
+a SQL statement, or a function of the connection for what SQL cannot compute.
+"""
+
+import logging
+from collections.abc import Callable
+
+from sqlalchemy import Connection, text
+
+logger = logging.getLogger(__name__)
+
+_BACKFILL_BATCH = 1000
+
+
+def _backfill_meal_text_keys(conn: Connection):
+    from app.openai_service import normalize_text
+
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(meals)"))}
+    if "text_key" not in columns:
+        conn.execute(text("ALTER TABLE meals ADD COLUMN text_key VARCHAR"))
+    select_page = text(
+        "SELECT rowid, text_input FROM meals WHERE rowid > :after AND text_input IS NOT NULL "
+        "ORDER BY rowid LIMIT :limit"
+    )
+    after = 0
+    while rows := conn.execute(select_page, {"after": after, "limit": _BACKFILL_BATCH}).all():
+        conn.execute(
+            text("UPDATE meals SET text_key = :key WHERE rowid = :rowid"),
+            [{"rowid": rowid, "key": normalize_text(value) or None} for rowid, value in rows],
+        )
+        after = rows[-1][0]
+
+
+MIGRATIONS: list[tuple[int, list[str | Callable[[Connection], None]]]] = [
+    (
+        1,
+        [
+            "CREATE INDEX IF NOT EXISTS ix_meals_user_date_created "
+            "ON meals (user_id, meal_date, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_meals_user_text_created "
+            "ON meals (user_id, text_input, created_at)",
+        ],
+    ),
+    (
+        2,
+        [
+            # daily_totals itself is created by create_all; backfill it from meals
+            "DELETE FROM daily_totals",
+            "INSERT INTO daily_totals "
+            "(user_id, meal_date, meal_count, calories, protein, carbs, fat, sugar) "
+            "SELECT user_id, meal_date, COUNT(*), SUM(calories), SUM(protein), "
+            "SUM(carbs), SUM(fat), SUM(sugar) FROM meals GROUP BY user_id, meal_date",
+        ],
+    ),
+    (
+        3,
+        [
+            # External-content FTS5 index over meal_search_entries (created by create_all)
+            "CREATE VIRTUAL TABLE IF NOT EXISTS meal_search USING fts5("
+            "text_input, user_id, content='meal_search_entries', content_rowid='id', "
+            "prefix='2 3')",
+            "CREATE TRIGGER IF NOT EXISTS meal_search_ai AFTER INSERT ON meal_search_entries "
+            "BEGIN INSERT INTO meal_search (rowid, text_input, user_id) "
+            "VALUES (new.id, new.text_input, new.user_id); END",
+            "CREATE TRIGGER IF NOT EXISTS meal_search_ad AFTER DELETE ON meal_search_entries "
+            "BEGIN INSERT INTO meal_search (meal_search, rowid, text_input, user_id) "
+            "VALUES ('delete', old.id, old.text_input, old.user_id); END",
+            "CREATE TRIGGER IF NOT EXISTS meal_search_au AFTER UPDATE ON meal_search_entries "
+            "BEGIN INSERT INTO meal_search (meal_search, rowid, text_input, user_id) "
+            "VALUES ('delete', old.id, old.text_input, old.user_id); "
+            "INSERT INTO meal_search (rowid, text_input, user_id) "
+            "VALUES (new.id, new.text_input, new.user_id); END",
+            "DELETE FROM meal_search_entries",
+            "INSERT OR REPLACE INTO meal_search_entries "
+            "(user_id, text_input, calories, protein, carbs, fat, sugar, last_used_at, use_count) "
+            "SELECT m.user_id, m.text_input, m.calories, m.protein, m.carbs, m.fat, m.sugar, "
+            "m.created_at, g.uses FROM meals m JOIN ("
+            "SELECT user_id, text_input, MAX(created_at) AS latest, COUNT(*) AS uses FROM meals "
+            "WHERE text_input IS NOT NULL AND text_input != '' GROUP BY user_id, text_input"
+            ") g ON m.user_id = g.user_id AND m.text_input = g.text_input "
+            "AND m.created_at = g.latest",
+            "INSERT INTO meal_search (meal_search) VALUES ('rebuild')",
+        ],
+    ),
+    (
+        4,
+        [
+            # Extend the date index with id so history keyset pages need no sort
+            "CREATE INDEX IF NOT EXISTS ix_meals_user_date_created_id "
+            "ON meals (user_id, meal_date, created_at, id)",
+            "DROP INDEX IF EXISTS ix_meals_user_date_created",
+        ],
+    ),
+    (
+        5,
+        [
+            # Normalized meal text, so exact history matches are an index lookup
+            _backfill_meal_text_keys,
+            "CREATE INDEX IF NOT EXISTS ix_meals_user_text_key_created "
+            "ON meals (user_id, text_key, created_at)",
+        ],
+    ),
+]
+
+
+def get_version(conn: Connection) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar_one()
+
+
+def set_version(conn: Connection, version: int):
+    # PRAGMA does not accept bound parameters
+    conn.execute(text(f"PRAGMA user_version = {int(version)}"))
+
+
+def run_migrations(conn: Connection):
+    """Apply every migration newer than the database's current version."""
+    current = get_version(conn)
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info("Applying schema migration %d", version)
+        for statement in statements:
+            if callable(statement):
+                statement(conn)
+            else:
+                conn.execute(text(statement))
+        set_version(conn, version)
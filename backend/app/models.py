@@ -23,6 +23,7 @@ class MealResponse(BaseModel):
     sugar: float
     error: str = ""
     created_at: str = ""
+    from_history: bool = False
 
 
 class MealUpdate(BaseModel):
@@ -104,3 +105,58 @@ class QuickMealCreate(BaseModel):
     carbs: float
     fat: float
     sugar: float
+
+
+class ExtractionJobResponse(BaseModel):
+    job_id: str
+    status: str
+    error: str = ""
+    meal: MealResponse | None = None
+
+
+class DaySubtotal(BaseModel):
+    date: str
+    meal_count: int
+    totals: MacroTotals
+
+
+class MealHistoryPage(BaseModel):
+    user_id: str
+    meals: list[MealResponse]
+    days: list[DaySubtotal]
+    next_cursor: str | None
+
+
+class ImportResult(BaseModel):
+    imported: int
+    skipped: int
+    errors: list[str]
+
+
+class BatchMealEntry(BaseModel):
+    """One meal of a batch; macros given in full make it a quick entry, else they are extracted."""
+
+    text_input: str
+    meal_date: str | None = None
+    calories: int | None = None
+    protein: float | None = None
+    carbs: float | None = None
+    fat: float | None = None
+    sugar: float | None = None
+
+
+class BatchMealCreate(BaseModel):
+    user_id: str
+    meals: list[BatchMealEntry]
+    use_history: bool = True
+
+
+class BatchMealResult(BaseModel):
+    index: int
+    meal: MealResponse | None = None
+    error: str = ""
+
+
+class BatchMealResponse(BaseModel):
+    user_id: str
+    results: list[BatchMealResult]
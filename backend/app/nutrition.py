@@ -0,0 +1,267 @@
+"""Local nutrition table used to answer simple text inputs without the model.
+
+``data/foods.csv`` lists common foods with macros per 100 g and the weight
+of their usual portions (``each``, ``large``, ``slice``, ``cup``, ...).
+Foods eaten as a unit also have a ``serving``, which is what a mention
+without a quantity ("banana", "coffee") resolves to. It is loaded once into
+an alias -> food dict. :func:`estimate` splits a meal
+description into ingredients, parses each one's quantity and unit, and sums
+the macros when every ingredient resolves unambiguously; anything it cannot
+parse with confidence returns None so the caller falls back to the LLM.
+"""
+
+import csv
+import logging
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+LOCAL_NUTRITION_ENABLED = os.environ.get("LOCAL_NUTRITION_ENABLED", "1") == "1"
+NUTRITION_TABLE = os.environ.get(
+    "NUTRITION_TABLE", str(Path(__file__).resolve().parent / "data" / "foods.csv")
+)
+
+# A bare count above this ("500 chicken") is more likely a weight missing its unit
+NUTRITION_MAX_COUNT = float(os.environ.get("NUTRITION_MAX_COUNT", "12"))
+# Local answers above this are left to the model
+NUTRITION_MAX_CALORIES = float(os.environ.get("NUTRITION_MAX_CALORIES", "2500"))
+
+MACROS = ("calories", "protein", "carbs", "fat", "sugar")
+
+# Grams per unit for weights; volumes are relative to the food's "cup" portion
+_MASS_UNITS = {
+    "g": 1.0, "gram": 1.0, "gr": 1.0, "kg": 1000.0, "kilogram": 1000.0,
+    "oz": 28.35, "ounce": 28.35, "lb": 453.6, "lbs": 453.6, "pound": 453.6,
+}  # fmt: skip
+_CUP_FRACTIONS = {
+    "cup": 1.0, "c": 1.0,
+    "tbsp": 1 / 16, "tablespoon": 1 / 16, "tbs": 1 / 16, "tbl": 1 / 16,
+    "tsp": 1 / 48, "teaspoon": 1 / 48,
+    "ml": 1 / 236.6, "milliliter": 1 / 236.6, "l": 1000 / 236.6, "liter": 1000 / 236.6,
+}  # fmt: skip
+_NUMBER_WORDS = {
+    "a": 1.0, "an": 1.0, "one": 1.0, "two": 2.0, "three": 3.0, "four": 4.0, "five": 5.0,
+    "six": 6.0, "seven": 7.0, "eight": 8.0, "nine": 9.0, "ten": 10.0, "half": 0.5,
+}  # fmt: skip
+_FRACTION_CHARS = {"½": "1/2", "¼": "1/4", "¾": "3/4", "⅓": "1/3", "⅔": "2/3"}
+_SIZES = ("small", "medium", "large", "jumbo")
+
+# Preparations that don't change the macros of the table entry
+_NEUTRAL_WORDS = frozenset(
+    "boiled steamed grilled baked roasted raw cooked plain fresh chopped sliced diced "
+    "toasted poached mixed organic".split()
+)  # fmt: skip
+# Preparations that do; they must be part of a table entry's name, e.g. "scrambled egg"
+_PREPARATIONS = frozenset("scrambled fried".split())
+_FILLER_WORDS = frozenset(("of", "the", "some"))
+
+_SPLIT_RE = re.compile(r"\s*(?:,|;|\+|&|\band\b|\bwith\b)\s*")
+_ATTACHED_UNIT_RE = re.compile(r"(\d)([a-z]+)\b")
+_TOKEN_RE = re.compile(r"\d+/\d+|\d+(?:\.\d+)?|[a-z]+")
+
+
+@dataclass(frozen=True, slots=True)
+class Food:
+    name: str
+    per_gram: tuple[float, ...]
+    portions: dict[str, float]
+
+
+_foods: dict[str, Food] | None = None
+_stats = {"text_requests": 0, "answered": 0}
+
+
+def stats() -> dict:
+    total = _stats["text_requests"]
+    return {
+        **_stats,
+        "foods": len({id(f) for f in (_foods or {}).values()}),
+        "local_fraction": _stats["answered"] / total if total else 0.0,
+    }
+
+
+def load(path: str = NUTRITION_TABLE) -> dict[str, Food]:
+    """Read the food table into the alias index used by :func:`estimate`."""
+    global _foods
+    foods: dict[str, Food] = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            portions = {}
+            for portion in filter(None, row["portions"].split("|")):
+                unit, grams = portion.split("=")
+                portions[unit] = float(grams)
+            food = Food(
+                name=row["name"],
+                per_gram=tuple(float(row[m]) / 100 for m in MACROS),
+                portions=portions,
+            )
+            for alias in [row["name"], *filter(None, row["aliases"].split("|"))]:
+                foods[alias] = food
+    _foods = foods
+    logger.info("Loaded %d food names from %s", len(foods), path)
+    return foods
+
+
+def _singular(word: str) -> str:
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us")) and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def _lookup(foods: dict[str, Food], words: list[str]) -> Food | None:
+    name = " ".join(words)
+    food = foods.get(name)
+    if food is None and words:
+        food = foods.get(" ".join([*words[:-1], _singular(words[-1])]))
+    return food
+
+
+def _quantity(tokens: list[str]) -> tuple[float | None, list[str]]:
+    """Consume a leading quantity such as ``2``, ``1.5``, ``1 1/2``, ``a`` or ``half a``."""
+    amount = None
+    while tokens:
+        token = tokens[0]
+        if "/" in token:
+            numerator, denominator = token.split("/")
+            if float(denominator) == 0:
+                return None, tokens
+            value = float(numerator) / float(denominator)
+        elif token[0].isdigit():
+            value = float(token)
+        elif token in _NUMBER_WORDS:
+            value = _NUMBER_WORDS[token]
+        else:
+            break
+        # "half a" and "1 1/2" combine; anything else is a second quantity
+        if amount is None:
+            amount = value
+        elif token in ("a", "an") and amount == 0.5:
+            pass
+        elif "/" in token and amount == int(amount):
+            amount += value
+        else:
+            return None, tokens
+        tokens = tokens[1:]
+    return amount, tokens
+
+
+def _grams(food: Food, amount: float, unit: str | None, size: str | None) -> float | None:
+    if unit in _MASS_UNITS:
+        return amount * _MASS_UNITS[unit]
+    if unit in _CUP_FRACTIONS:
+        if unit in food.portions:
+            return amount * food.portions[unit]
+        if "tbsp" in food.portions and unit in ("tsp", "teaspoon"):
+            return amount * food.portions["tbsp"] / 3
+        if "cup" in food.portions:
+            return amount * food.portions["cup"] * _CUP_FRACTIONS[unit]
+        return None
+    if unit is not None:
+        return amount * food.portions[unit] if unit in food.portions else None
+    portion = food.portions.get(size or "each")
+    return amount * portion if portion is not None else None
+
+
+def _parse_item(foods: dict[str, Food], tokens: list[str]) -> tuple[float, ...] | None:
+    amount, tokens = _quantity(tokens)
+
+    unit = None
+    if tokens and (_singular(tokens[0]) in _MASS_UNITS or tokens[0] in _MASS_UNITS):
+        unit = tokens[0] if tokens[0] in _MASS_UNITS else _singular(tokens[0])
+        tokens = tokens[1:]
+    elif tokens and (_singular(tokens[0]) in _CUP_FRACTIONS or tokens[0] in _CUP_FRACTIONS):
+        unit = tokens[0] if tokens[0] in _CUP_FRACTIONS else _singular(tokens[0])
+        tokens = tokens[1:]
+
+    size = None
+    preparations = []
+    words = []
+    for token in tokens:
+        if token in _SIZES and size is None and not words:
+            size = token
+        elif token in _PREPARATIONS:
+            preparations.append(token)
+        elif token not in _NEUTRAL_WORDS and token not in _FILLER_WORDS:
+            words.append(token)
+    if not words:
+        return None
+    # "almonds" or "egg whites" says nothing about how many
+    if amount is None and any(_singular(word) != word for word in words):
+        return None
+
+    # A count unit such as "slices" or "scoop" is a portion name of the food itself
+    food = _lookup(foods, [*preparations, *words])
+    if food is None and unit is None and len(words) > 1:
+        food = _lookup(foods, [*preparations, *words[1:]])
+        if food is not None:
+            unit = _singular(words[0])
+    if food is None:
+        return None
+    if not any(food.per_gram):
+        return food.per_gram
+    # "and bacon" could be one strip or five; only a natural single serving is implied
+    if amount is None and unit is None:
+        if "serving" not in food.portions:
+            return None
+        if size is None:
+            unit = "serving"
+    counted = unit not in _MASS_UNITS and unit not in _CUP_FRACTIONS
+    if counted and amount is not None and amount > NUTRITION_MAX_COUNT:
+        return None
+
+    grams = _grams(food, 1.0 if amount is None else amount, unit, size)
+    if grams is None or grams <= 0:
+        return None
+    return tuple(value * grams for value in food.per_gram)
+
+
+def _estimate(foods: dict[str, Food], text: str) -> dict | None:
+    normalized = text.lower()
+    for char, fraction in _FRACTION_CHARS.items():
+        normalized = normalized.replace(char, f" {fraction}")
+    normalized = _ATTACHED_UNIT_RE.sub(r"\1 \2", normalized)
+
+    # Parts without a food ("1 large egg, scrambled") describe the previous item
+    items: list[list[str]] = []
+    for part in _SPLIT_RE.split(normalized):
+        tokens = _TOKEN_RE.findall(part)
+        if not tokens:
+            continue
+        if items and all(t in _NEUTRAL_WORDS or t in _PREPARATIONS for t in tokens):
+            items[-1] += tokens
+        else:
+            items.append(tokens)
+    if not items:
+        return None
+
+    totals = [0.0] * len(MACROS)
+    for tokens in items:
+        values = _parse_item(foods, tokens)
+        if values is None:
+            return None
+        totals = [a + b for a, b in zip(totals, values, strict=True)]
+    if totals[0] > NUTRITION_MAX_CALORIES:
+        return None
+    return {
+        "calories": round(totals[0]),
+        **{m: round(v, 1) for m, v in zip(MACROS[1:], totals[1:], strict=True)},
+    }
+
+
+def estimate(text: str) -> dict | None:
+    """Macros for ``text`` from the local table, or None unless every ingredient resolves."""
+    if not LOCAL_NUTRITION_ENABLED:
+        return None
+    foods = _foods if _foods is not None else load()
+    _stats["text_requests"] += 1
+    result = _estimate(foods, text)
+    if result is not None:
+        _stats["answered"] += 1
+    return result
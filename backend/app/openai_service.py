@@ -1,12 +1,22 @@
+import asyncio
 import base64
+import hashlib
 import json
 import logging
 import os
-from dataclasses import dataclass
+import re
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
 
+import httpx
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from app import extraction_cache, hedging, metrics, nutrition, payload_log
+from app.extraction_scheduler import scheduler
+from app.images import sniff_mime
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +24,15 @@ logger = logging.getLogger(__name__)
 _project_root = Path(__file__).resolve().parent.parent.parent
 load_dotenv(_project_root / ".env")
 
+# Connection pool for the shared client. OPENAI_BASE_URL can point at any
+# OpenAI-compatible server, e.g. a local stub for load tests.
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "50"))
+OPENAI_MAX_KEEPALIVE = int(os.environ.get("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", "60"))
+OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get("OPENAI_CONNECT_TIMEOUT", "10"))
+
 _SYSTEM_PROMPT = """\
 You are a nutrition extraction engine. Your job is to extract calories \
 and macro nutrients from meal descriptions and nutrition label images.
@@ -53,12 +72,7 @@ You may receive:
 - an image (nutrition label, meal photo, screenshot),
 - or both.
 
-Before calculating final values, think step by step:
-1. Break the meal into individual ingredients with estimated portions
-2. Estimate macros for each ingredient separately
-3. Sum all ingredients for final totals
-
-Put your step-by-step breakdown in the "reasoning" field.
+{reasoning}
 
 Rules:
 - If all values are confidently determined, set error to "".
@@ -69,6 +83,32 @@ based on typical nutritional data for that food. This is expected and not guessi
 natural meal description (e.g. "Grilled chicken breast with steamed broccoli and brown rice").
 - If the input is truly ambiguous or unrelated to food, set error to a descriptive message."""
 
+_REASONING = {
+    "full": """\
+Before calculating final values, think step by step:
+1. Break the meal into individual ingredients with estimated portions
+2. Estimate macros for each ingredient separately
+3. Sum all ingredients for final totals
+
+Put your step-by-step breakdown in the "reasoning" field.""",
+    "compact": """\
+Break the meal into ingredients with estimated portions, estimate each one \
+and sum them for the final totals. Return only the totals.""",
+}
+
+_MULTI_REASONING = {
+    "full": """\
+For each item, think step by step:
+1. Break the meal into individual ingredients with estimated portions
+2. Estimate macros for each ingredient separately
+3. Sum all ingredients for the item's totals
+
+Put each item's step-by-step breakdown in its "reasoning" field.""",
+    "compact": """\
+For each item, estimate its ingredients with their portions and sum them \
+for the item's totals. Return only the totals.""",
+}
+
 _RESPONSE_FORMAT = {
     "type": "json_schema",
     "json_schema": {
@@ -101,8 +141,127 @@ _RESPONSE_FORMAT = {
     },
 }
 
+_MULTI_USER_PROMPT = """\
+Extract nutritional information for each separate meal in the provided description.
+
+The description may list several meals or eating occasions, e.g. \
+"breakfast: 2 eggs and toast; lunch: burrito bowl". Return one item per meal, \
+in the order given. A description of a single meal is one item.
+
+{reasoning}
+
+Rules:
+- Set each item's description to the user's text for that meal, without labels \
+such as "breakfast:" (e.g. "2 eggs and toast").
+- Estimate macros for named dishes based on typical nutritional data. This is \
+expected and not guessing.
+- If all items are confidently determined, set error to "".
+- If the input is truly ambiguous or unrelated to food, set error to a descriptive message."""
+
+# One meal of a multi-meal extraction: the single-meal schema, with one error for the whole call
+_MEAL_ITEM_SCHEMA = {
+    **_RESPONSE_FORMAT["json_schema"]["schema"],
+    "properties": {
+        k: v
+        for k, v in _RESPONSE_FORMAT["json_schema"]["schema"]["properties"].items()
+        if k != "error"
+    },
+    "required": [k for k in _RESPONSE_FORMAT["json_schema"]["schema"]["required"] if k != "error"],
+}
+
+_MULTI_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "nutrition_extraction_multi",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "items": {"type": "array", "items": _MEAL_ITEM_SCHEMA},
+                "error": {"type": "string"},
+            },
+            "required": ["items", "error"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# "compact" drops the reasoning field and the examples' worked breakdowns,
+# trading some accuracy for far fewer prompt and completion tokens
+EXTRACTION_PROMPT_MODE = os.environ.get("EXTRACTION_PROMPT_MODE", "full")
+_COMPACT = EXTRACTION_PROMPT_MODE == "compact"
+
+
+def _without_reasoning(schema: dict) -> dict:
+    return {
+        **schema,
+        "properties": {k: v for k, v in schema["properties"].items() if k != "reasoning"},
+        "required": [k for k in schema["required"] if k != "reasoning"],
+    }
+
+
+# Everything static lives in the system message, byte-identical across
+# requests, so the provider's prompt caching can reuse it; the user message
+# carries only the meal itself.
+_EXAMPLES = (
+    re.sub(r"^Reasoning: .*\n", "", _SYSTEM_PROMPT, flags=re.M) if _COMPACT else _SYSTEM_PROMPT
+)
+_SYSTEM_MESSAGE = "\n\n".join(
+    [_EXAMPLES, _USER_PROMPT.format(reasoning=_REASONING["compact" if _COMPACT else "full"])]
+)
+_MULTI_SYSTEM_MESSAGE = "\n\n".join(
+    [
+        _EXAMPLES,
+        _MULTI_USER_PROMPT.format(reasoning=_MULTI_REASONING["compact" if _COMPACT else "full"]),
+    ]
+)
+if _COMPACT:
+    _FORMAT = {
+        **_RESPONSE_FORMAT,
+        "json_schema": {
+            **_RESPONSE_FORMAT["json_schema"],
+            "schema": _without_reasoning(_RESPONSE_FORMAT["json_schema"]["schema"]),
+        },
+    }
+    _MULTI_SCHEMA = _MULTI_RESPONSE_FORMAT["json_schema"]["schema"]
+    _MULTI_FORMAT = {
+        **_MULTI_RESPONSE_FORMAT,
+        "json_schema": {
+            **_MULTI_RESPONSE_FORMAT["json_schema"],
+            "schema": {
+                **_MULTI_SCHEMA,
+                "properties": {
+                    **_MULTI_SCHEMA["properties"],
+                    "items": {"type": "array", "items": _without_reasoning(_MEAL_ITEM_SCHEMA)},
+                },
+            },
+        },
+    }
+else:
+    _FORMAT, _MULTI_FORMAT = _RESPONSE_FORMAT, _MULTI_RESPONSE_FORMAT
+
+_MODEL = "gpt-4o"
+
 _MAX_RETRIES = 2
 
+# Tiered routing: short text-only inputs try OPENAI_FAST_MODEL first and
+# escalate to _MODEL when the answer has an error or fails the sanity check.
+# An empty OPENAI_FAST_MODEL sends everything to _MODEL.
+OPENAI_FAST_MODEL = os.environ.get("OPENAI_FAST_MODEL", "gpt-4o-mini")
+ROUTING_FAST_MAX_WORDS = int(os.environ.get("ROUTING_FAST_MAX_WORDS", "40"))
+# Largest allowed gap between stated calories and 4/4/9 kcal per gram of
+# protein/carbs/fat, relative and absolute (fiber and alcohol skew it a little)
+ROUTING_KCAL_TOLERANCE = float(os.environ.get("ROUTING_KCAL_TOLERANCE", "0.25"))
+ROUTING_KCAL_SLACK = float(os.environ.get("ROUTING_KCAL_SLACK", "40"))
+# Wall-clock seconds one extraction may spend across all attempts; 0 disables
+EXTRACTION_LATENCY_BUDGET = float(os.environ.get("EXTRACTION_LATENCY_BUDGET", "60"))
+
+# Changes whenever the model or anything sent with every request changes, so
+# cached extractions from an older prompt are never served.
+PROMPT_VERSION = hashlib.sha256(
+    "\0".join([_MODEL, OPENAI_FAST_MODEL, _SYSTEM_MESSAGE, json.dumps(_FORMAT)]).encode()
+).hexdigest()[:16]
+
 
 @dataclass
 class ExtractionResult:
@@ -115,16 +274,151 @@ class ExtractionResult:
     description: str = ""
 
 
+@dataclass
+class MultiExtractionResult:
+    items: list[ExtractionResult]
+    error: str
+
+
+_client: AsyncOpenAI | None = None
+
+
+def init_client() -> AsyncOpenAI | None:
+    """Create the application-wide OpenAI client if an API key is configured."""
+    global _client
+    if _client is None and os.environ.get("OPENAI_API_KEY"):
+        _client = AsyncOpenAI(
+            base_url=OPENAI_BASE_URL,
+            # Retries and backoff are handled by extract_macros and the scheduler
+            max_retries=0,
+            timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+                ),
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+# Extractions currently running, keyed like the cache, so identical concurrent
+# requests await one call instead of each starting their own
+_in_flight: dict[str, asyncio.Future] = {}
+_singleflight_stats = {"leaders": 0, "coalesced": 0, "leader_cancelled": 0}
+
+
+def singleflight_stats() -> dict:
+    return {**_singleflight_stats, "in_flight": len(_in_flight)}
+
+
+_routing_stats = {"escalations": 0, "sanity_failures": 0, "budget_exhausted": 0}
+
+
+def routing_stats() -> dict:
+    return {
+        **_routing_stats,
+        "tiers": {
+            dict(labels)["model"]: h.snapshot()
+            for labels, h in metrics.series("openai_attempt_duration_seconds").items()
+        },
+    }
+
+
+_token_usage: dict[str, dict[str, int]] = {}
+
+
+def token_stats() -> dict:
+    """Prompt, completion and provider-cached prompt tokens per model, as reported by the API."""
+    models = {}
+    for model, usage in _token_usage.items():
+        calls = usage["calls"]
+        models[model] = {
+            **usage,
+            "prompt_tokens_per_call": usage["prompt_tokens"] / calls,
+            "completion_tokens_per_call": usage["completion_tokens"] / calls,
+            "cached_fraction": usage["cached_tokens"] / (usage["prompt_tokens"] or 1),
+        }
+    return {"prompt_mode": "compact" if _COMPACT else "full", "models": models}
+
+
+def _record_usage(model: str, response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    totals = _token_usage.setdefault(
+        model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    )
+    totals["calls"] += 1
+    totals["prompt_tokens"] += usage.prompt_tokens or 0
+    totals["completion_tokens"] += usage.completion_tokens or 0
+    totals["cached_tokens"] += (getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+
+def _attempt_latency(model: str) -> metrics.Histogram:
+    return metrics.histogram(
+        "openai_attempt_duration_seconds", metrics.LATENCY_BUCKETS, model=model
+    )
+
+
+def _route(text: str | None, image_bytes: bytes | None) -> list[str]:
+    """Models to try in order for an input, cheapest first."""
+    if OPENAI_FAST_MODEL and not image_bytes:
+        if len((text or "").split()) <= ROUTING_FAST_MAX_WORDS:
+            return [OPENAI_FAST_MODEL, _MODEL]
+    return [_MODEL]
+
+
+def _implausible(result: ExtractionResult) -> str:
+    """Why ``result`` can't be right, or "" when it passes the sanity check."""
+    macros = (result.calories, result.protein, result.carbs, result.fat, result.sugar)
+    if any(value < 0 for value in macros):
+        return "negative macro value"
+    if result.sugar > result.carbs + 0.5:
+        return f"sugar {result.sugar}g exceeds carbs {result.carbs}g"
+    expected = 4 * result.protein + 4 * result.carbs + 9 * result.fat
+    if abs(result.calories - expected) > ROUTING_KCAL_TOLERANCE * expected + ROUTING_KCAL_SLACK:
+        return f"{result.calories} kcal inconsistent with macros ({expected:.0f} kcal by 4/4/9)"
+    return ""
+
+
+def normalize_text(text: str | None) -> str:
+    """Lowercase and collapse whitespace so trivially different inputs compare equal."""
+    return " ".join((text or "").lower().split())
+
+
+def _cache_key(text: str | None, image_bytes: bytes | None) -> str:
+    image_hash = hashlib.sha256(image_bytes).hexdigest() if image_bytes else ""
+    raw = "\0".join([PROMPT_VERSION, normalize_text(text), image_hash])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _estimate_tokens(text: str | None, image_bytes: bytes | None) -> int:
+    """Rough prompt + completion token count, used to spend from the TPM budget."""
+    prompt_chars = len(_SYSTEM_MESSAGE) + len(text or "")
+    image_tokens = 1105 if image_bytes else 0  # high-detail 1024x1024 tile estimate
+    return prompt_chars // 4 + image_tokens + (80 if _COMPACT else 400)
+
+
 def _build_messages(text: str | None, image_bytes: bytes | None) -> list[dict]:
     """Build the messages array for the OpenAI chat completion request."""
     messages: list[dict] = [
-        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "system", "content": _SYSTEM_MESSAGE},
     ]
 
-    user_content: list[dict] = [{"type": "text", "text": _USER_PROMPT}]
+    user_content: list[dict] = []
 
     if text:
-        user_content.append({"type": "text", "text": f"\nMeal description: {text}"})
+        user_content.append({"type": "text", "text": f"Meal description: {text}"})
 
     if image_bytes:
         b64 = base64.b64encode(image_bytes).decode("utf-8")
@@ -132,7 +426,7 @@ def _build_messages(text: str | None, image_bytes: bytes | None) -> list[dict]:
             {
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:image/jpeg;base64,{b64}",
+                    "url": f"data:{sniff_mime(image_bytes)};base64,{b64}",
                 },
             }
         )
@@ -141,31 +435,38 @@ def _build_messages(text: str | None, image_bytes: bytes | None) -> list[dict]:
     return messages
 
 
-async def _call_openai(text: str | None, image_bytes: bytes | None) -> ExtractionResult:
+async def _call_openai(
+    text: str | None, image_bytes: bytes | None, model: str = _MODEL
+) -> ExtractionResult:
     """Call the OpenAI API and parse the structured JSON response."""
-    client = AsyncOpenAI()
+    client = init_client()
     messages = _build_messages(text, image_bytes)
 
-    logger.info(
-        "Calling OpenAI gpt-4o (text=%s, has_image=%s)", repr(text), image_bytes is not None
+    payload_log.log(
+        logger,
+        "Calling OpenAI %s (text=%s, has_image=%s)",
+        model,
+        repr(text),
+        image_bytes is not None,
     )
 
     response = await client.chat.completions.create(
-        model="gpt-4o",
+        model=model,
         messages=messages,
         temperature=0,
-        response_format=_RESPONSE_FORMAT,
+        response_format=_FORMAT,
     )
+    _record_usage(model, response)
 
     raw = response.choices[0].message.content or ""
-    logger.info("OpenAI raw response: %s", raw)
+    payload_log.log(logger, "OpenAI raw response: %s", raw)
 
     data = json.loads(raw)
 
     # Log the reasoning for debugging but don't store it
     reasoning = data.get("reasoning", "")
     if reasoning:
-        logger.info("Model reasoning: %s", reasoning)
+        payload_log.log(logger, "Model reasoning: %s", reasoning)
 
     result = ExtractionResult(
         calories=int(data.get("calories", 0)),
@@ -176,7 +477,8 @@ async def _call_openai(text: str | None, image_bytes: bytes | None) -> Extractio
         error=str(data.get("error", "")),
         description=str(data.get("description", "")),
     )
-    logger.info(
+    payload_log.log(
+        logger,
         "Parsed result: calories=%d protein=%.1f carbs=%.1f fat=%.1f sugar=%.1f error=%r",
         result.calories,
         result.protein,
@@ -188,13 +490,250 @@ async def _call_openai(text: str | None, image_bytes: bytes | None) -> Extractio
     return result
 
 
-async def extract_macros(text: str | None, image_bytes: bytes | None) -> ExtractionResult:
+async def _call_openai_multi(text: str, model: str = _MODEL) -> MultiExtractionResult:
+    """Ask for every meal in ``text`` at once, using the array response schema."""
+    client = init_client()
+    messages = [
+        {"role": "system", "content": _MULTI_SYSTEM_MESSAGE},
+        {"role": "user", "content": f"Meal description: {text}"},
+    ]
+
+    payload_log.log(logger, "Calling OpenAI %s for multiple meals (text=%s)", model, repr(text))
+
+    response = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0,
+        response_format=_MULTI_FORMAT,
+    )
+    _record_usage(model, response)
+
+    raw = response.choices[0].message.content or ""
+    payload_log.log(logger, "OpenAI raw response: %s", raw)
+
+    data = json.loads(raw)
+    items = [
+        ExtractionResult(
+            calories=int(item.get("calories", 0)),
+            protein=float(item.get("protein", 0.0)),
+            carbs=float(item.get("carbs", 0.0)),
+            fat=float(item.get("fat", 0.0)),
+            sugar=float(item.get("sugar", 0.0)),
+            error="",
+            description=str(item.get("description", "")),
+        )
+        for item in data.get("items", [])
+    ]
+    error = str(data.get("error", ""))
+    if not items and not error:
+        error = "No meals found in the description"
+    logger.info("Parsed %d meal(s), error=%r", len(items), error)
+    return MultiExtractionResult(items=items, error=error)
+
+
+def _problem(result: ExtractionResult | MultiExtractionResult) -> str:
+    items = result.items if isinstance(result, MultiExtractionResult) else [result]
+    return next(filter(None, map(_implausible, items)), "")
+
+
+async def _call_in_slot[R](
+    user_id: str, estimated_tokens: int, call: Callable[[str], Awaitable[R]], model: str
+) -> R:
+    async with scheduler.slot(user_id, estimated_tokens):
+        return await call(model)
+
+
+async def _with_retries[R: (ExtractionResult, MultiExtractionResult)](
+    user_id: str,
+    estimated_tokens: int,
+    models: list[str],
+    call: Callable[[str], Awaitable[R]],
+) -> tuple[R | None, str]:
+    """Run ``call(model)`` in scheduler slots until it returns a usable result.
+
+    Starts on ``models[0]`` and moves to the next tier whenever the model
+    reports an error or the answer fails the sanity check; the last tier's
+    answer is accepted even if implausible. Transport errors, rate limits and
+    5xx responses retry the same tier after backing off; other exceptions move
+    to the next tier and end the attempts on the last one. Attempts also stop
+    once ``EXTRACTION_LATENCY_BUDGET`` is spent; time queued for a scheduler
+    slot does not count against it. Returns ``(result, "")`` or
+    ``(None, last error)``.
+    """
+    deadline = time.monotonic() + EXTRACTION_LATENCY_BUDGET if EXTRACTION_LATENCY_BUDGET else None
+    tier = 0
+    last_error = ""
+    for attempt in range(_MAX_RETRIES + 1):
+        remaining = deadline - time.monotonic() if deadline else None
+        if remaining is not None and remaining <= 0:
+            _routing_stats["budget_exhausted"] += 1
+            last_error = last_error or "Extraction latency budget exhausted"
+            break
+        model = models[tier]
+        started = time.monotonic()
+        try:
+            logger.info("Attempt %d/%d on %s", attempt + 1, _MAX_RETRIES + 1, model)
+            async with scheduler.slot(user_id, estimated_tokens):
+                if deadline:
+                    # Waiting for a slot does not spend the budget
+                    deadline += time.monotonic() - started
+                started = time.monotonic()
+                async with asyncio.timeout(deadline - started if deadline else None):
+                    result = await hedging.race(
+                        model,
+                        lambda: call(model),
+                        lambda: _call_in_slot(user_id, estimated_tokens, call, model),
+                        lambda r: not r.error and not _problem(r),
+                        estimated_tokens,
+                    )
+            _attempt_latency(model).observe(time.monotonic() - started)
+            if result.error:
+                # Non-empty error from model; retry
+                last_error = result.error
+                logger.warning("Model returned error on attempt %d: %s", attempt + 1, result.error)
+            else:
+                problem = _problem(result)
+                if not problem or tier == len(models) - 1:
+                    logger.info("Extraction succeeded on attempt %d (%s)", attempt + 1, model)
+                    return result, ""
+                _routing_stats["sanity_failures"] += 1
+                last_error = problem
+                logger.warning("Implausible answer from %s: %s", model, problem)
+            if tier < len(models) - 1:
+                tier += 1
+                _routing_stats["escalations"] += 1
+        except TimeoutError:
+            _attempt_latency(model).observe(time.monotonic() - started)
+            _routing_stats["budget_exhausted"] += 1
+            last_error = "Extraction latency budget exhausted"
+            logger.warning("Latency budget exhausted on attempt %d", attempt + 1)
+            break
+        except Exception as exc:
+            _attempt_latency(model).observe(time.monotonic() - started)
+            last_error = str(exc)
+            logger.exception("Exception on attempt %d: %s", attempt + 1, exc)
+            delay = scheduler.backoff_delay(exc, attempt)
+            if delay is None:
+                # Rejected requests and unparseable answers would fail again on
+                # this model, but the next tier may accept them
+                if tier < len(models) - 1:
+                    tier += 1
+                    _routing_stats["escalations"] += 1
+                    logger.warning("Escalating after non-transient error: %s", exc)
+                    continue
+                logger.warning("Not retrying non-transient error: %s", exc)
+                break
+            if attempt < _MAX_RETRIES:
+                if deadline and time.monotonic() + delay >= deadline:
+                    _routing_stats["budget_exhausted"] += 1
+                    break
+                logger.warning("Backing off %.2fs before retrying", delay)
+                await asyncio.sleep(delay)
+
+    logger.error(
+        "Extraction failed after %d attempt(s). Last error: %s",
+        attempt + 1,
+        last_error,
+    )
+    return None, last_error
+
+
+async def extract_meals(text: str, user_id: str = "") -> MultiExtractionResult:
+    """Split a description of several meals into per-meal macros with a single call.
+
+    Retries and scheduling work as in :func:`extract_macros`; results are not
+    cached. On total failure returns no items and an error message.
+    """
+    if not os.environ.get("OPENAI_API_KEY"):
+        logger.error("OPENAI_API_KEY is not set — returning no meals")
+        return MultiExtractionResult(items=[], error="OPENAI_API_KEY is not set")
+
+    # Leave completion room for a few more items than a single extraction
+    estimated_tokens = _estimate_tokens(text, None) + 800
+    models = _route(text, None)
+    result, last_error = await _with_retries(
+        user_id, estimated_tokens, models, lambda model: _call_openai_multi(text, model)
+    )
+    if result is None:
+        return MultiExtractionResult(
+            items=[], error=last_error or "Failed to extract meals after retries"
+        )
+    return result
+
+
+async def extract_macros(
+    text: str | None, image_bytes: bytes | None, user_id: str = ""
+) -> ExtractionResult:
     """Extract macro nutrients from meal text and/or image.
 
-    Calls the OpenAI API with up to 2 retries when the model returns
-    a non-empty error field. On total failure returns zeros with an
-    error message.
+    Text-only inputs that the local nutrition table resolves with confidence
+    are answered without calling the model. Successful results are served
+    from the persistent extraction cache when the same normalized input was
+    seen before, and concurrent requests for the same normalized input share
+    a single extraction. Otherwise calls the OpenAI API through the
+    extraction scheduler, queued fairly per ``user_id``: short text goes to
+    the fast model tier first and escalates to gpt-4o when the model returns
+    a non-empty error field or an implausible answer, with up to 2 retries
+    in total. Rate limits and transient errors back off before retrying, and
+    no attempt starts once the latency budget is spent. On total failure
+    returns zeros with an error message.
     """
+    if text and not image_bytes:
+        local = nutrition.estimate(text)
+        if local is not None:
+            result = ExtractionResult(error="", description=text, **local)
+            problem = _implausible(result)
+            if not problem:
+                payload_log.log(
+                    logger, "Resolved text=%s from the local nutrition table", repr(text)
+                )
+                return result
+            logger.warning("Ignoring local nutrition answer: %s", problem)
+
+    key = _cache_key(text, image_bytes)
+    cached = await extraction_cache.get(key)
+    if cached:
+        payload_log.log(logger, "Extraction cache hit for text=%s", repr(text))
+        # The prompt asks for the user's exact text as the description
+        if text:
+            cached["description"] = text
+        return ExtractionResult(error="", **cached)
+
+    while (pending := _in_flight.get(key)) is not None:
+        _singleflight_stats["coalesced"] += 1
+        payload_log.log(logger, "Joining in-flight extraction for text=%s", repr(text))
+        try:
+            result = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # A cancelled leader (client gone, shutdown) must not take its followers
+            # with it: join the next leader or lead the extraction ourselves
+            if pending.cancelled() and not asyncio.current_task().cancelling():
+                _singleflight_stats["leader_cancelled"] += 1
+                continue
+            raise
+        return replace(result, description=text) if text else result
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[key] = future
+    _singleflight_stats["leaders"] += 1
+    try:
+        result = await _extract_uncached(text, image_bytes, user_id, key)
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        future.set_exception(exc)
+        future.exception()  # followers re-raise it; don't warn when there are none
+        raise
+    finally:
+        del _in_flight[key]
+
+
+async def _extract_uncached(
+    text: str | None, image_bytes: bytes | None, user_id: str, key: str
+) -> ExtractionResult:
     api_key = os.environ.get("OPENAI_API_KEY", "")
     if not api_key:
         logger.error("OPENAI_API_KEY is not set — returning zeros")
@@ -208,29 +747,19 @@ async def extract_macros(text: str | None, image_bytes: bytes | None) -> Extract
             description=text or "",
         )
 
-    logger.info("extract_macros called: text=%s, has_image=%s", repr(text), image_bytes is not None)
-
-    last_error = ""
-    for attempt in range(_MAX_RETRIES + 1):
-        try:
-            logger.info("Attempt %d/%d", attempt + 1, _MAX_RETRIES + 1)
-            result = await _call_openai(text, image_bytes)
-            if result.error == "":
-                logger.info("Extraction succeeded on attempt %d", attempt + 1)
-                return result
-            # Non-empty error from model; retry
-            last_error = result.error
-            logger.warning("Model returned error on attempt %d: %s", attempt + 1, result.error)
-        except Exception as exc:
-            last_error = str(exc)
-            logger.exception("Exception on attempt %d: %s", attempt + 1, exc)
+    payload_log.log(
+        logger, "extract_macros called: text=%s, has_image=%s", repr(text), image_bytes is not None
+    )
 
-    # All attempts exhausted
-    logger.error(
-        "All %d attempts exhausted, returning zeros. Last error: %s",
-        _MAX_RETRIES + 1,
-        last_error,
+    estimated_tokens = _estimate_tokens(text, image_bytes)
+    models = _route(text, image_bytes)
+    result, last_error = await _with_retries(
+        user_id, estimated_tokens, models, lambda model: _call_openai(text, image_bytes, model)
     )
+    if result is not None:
+        await extraction_cache.put(key, asdict(result))
+        return result
+
     return ExtractionResult(
         calories=0,
         protein=0.0,
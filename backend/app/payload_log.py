@@ -0,0 +1,20 @@
+"""Logging of request and model payloads: meal text, raw responses, reasoning.
+
+They are logged at INFO by default. With ``PAYLOAD_LOG_MODE=sampled`` they go
+to DEBUG instead, and only ``PAYLOAD_LOG_SAMPLE_RATE`` of them, so a busy
+server doesn't format and write every payload.
+"""
+
+import logging
+import os
+import random
+
+PAYLOAD_LOG_MODE = os.environ.get("PAYLOAD_LOG_MODE", "info")
+PAYLOAD_LOG_SAMPLE_RATE = float(os.environ.get("PAYLOAD_LOG_SAMPLE_RATE", "0.01"))
+
+
+def log(logger: logging.Logger, msg: str, *args):
+    if PAYLOAD_LOG_MODE != "sampled":
+        logger.info(msg, *args)
+    elif random.random() < PAYLOAD_LOG_SAMPLE_RATE and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(msg, *args)
@@ -0,0 +1,76 @@
+"""Per-user read-through cache of serialized dashboard responses.
+
+Each user has a version number that meal and goal writes bump. Read endpoints
+serve the cached JSON body while its version is current, with a strong ETag
+derived from the body, and answer a matching ``If-None-Match`` with 304
+without querying the database.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from app import metrics
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+
+
+@dataclass
+class _Entry:
+    version: int
+    etag: str
+    body: bytes
+
+
+_versions: dict[str, int] = {}
+_entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "not_modified": 0, "bytes_saved": 0}
+
+
+def stats() -> dict:
+    total = _stats["hits"] + _stats["misses"]
+    return {**_stats, "hit_rate": _stats["hits"] / total if total else 0.0}
+
+
+def bump(user_id: str):
+    """Invalidate every cached response for ``user_id``."""
+    _versions[user_id] = _versions.get(user_id, 0) + 1
+
+
+def _respond(request: Request, entry: _Entry) -> Response:
+    headers = {"ETag": entry.etag}
+    if request.headers.get("if-none-match") == entry.etag:
+        _stats["not_modified"] += 1
+        _stats["bytes_saved"] += len(entry.body)
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+async def serve(
+    request: Request, user_id: str, key: str, produce: Callable[[], Awaitable[BaseModel]]
+) -> Response:
+    """Return the cached response for ``(user_id, key)``, producing it on a miss."""
+    version = _versions.get(user_id, 0)
+    entry = _entries.get((user_id, key))
+    if entry is not None and entry.version == version:
+        _entries.move_to_end((user_id, key))
+        _stats["hits"] += 1
+        return _respond(request, entry)
+
+    _stats["misses"] += 1
+    result = await produce()
+    with metrics.span("serialize"):
+        body = result.model_dump_json().encode()
+    entry = _Entry(version=version, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', body=body)
+    # A write that landed while producing makes this body stale; don't keep it
+    if _versions.get(user_id, 0) == version:
+        _entries[(user_id, key)] = entry
+        _entries.move_to_end((user_id, key))
+        while len(_entries) > RESPONSE_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return _respond(request, entry)
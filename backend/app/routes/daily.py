@@ -1,28 +1,45 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.db_models import Meal
+from app import response_cache
+from app.database import AsyncDB, get_db
+from app.db_models import DailyTotal, Meal
 from app.models import DailyResponse, MacroTotals, MealResponse
 
 router = APIRouter(prefix="/api")
 
 
-@router.get("/daily/{date}", response_model=DailyResponse)
-async def get_daily(date: str, user_id: str, db: Session = Depends(get_db)):
+def _load_day(db: Session, user_id: str, date: str) -> tuple[DailyTotal | None, list[Meal]]:
+    totals = (
+        db.query(DailyTotal)
+        .filter(DailyTotal.user_id == user_id, DailyTotal.meal_date == date)
+        .first()
+    )
     meals = (
         db.query(Meal)
         .filter(Meal.user_id == user_id, Meal.meal_date == date)
         .order_by(Meal.created_at.desc())
         .all()
     )
+    return totals, meals
+
+
+@router.get("/daily/{date}", response_model=DailyResponse)
+async def get_daily(date: str, user_id: str, request: Request, db: AsyncDB = Depends(get_db)):
+    return await response_cache.serve(
+        request, user_id, f"daily:{date}", lambda: _build_daily(db, date, user_id)
+    )
+
+
+async def _build_daily(db: AsyncDB, date: str, user_id: str) -> DailyResponse:
+    day, meals = await db.run(_load_day, user_id, date)
 
     totals = MacroTotals(
-        calories=sum(m.calories for m in meals),
-        protein=sum(m.protein for m in meals),
-        carbs=sum(m.carbs for m in meals),
-        fat=sum(m.fat for m in meals),
-        sugar=sum(m.sugar for m in meals),
+        calories=day.calories if day else 0,
+        protein=day.protein if day else 0.0,
+        carbs=day.carbs if day else 0.0,
+        fat=day.fat if day else 0.0,
+        sugar=day.sugar if day else 0.0,
     )
 
     meal_responses = [
@@ -1,18 +1,34 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app import response_cache
+from app.database import AsyncDB, get_db
 from app.db_models import Goal
 from app.models import GoalsRequest, GoalsResponse
 
 router = APIRouter(prefix="/api")
 
 
+def _get_goal(db: Session, user_id: str) -> Goal | None:
+    return db.query(Goal).filter(Goal.user_id == user_id).first()
+
+
+def _save_goal(db: Session, goal: Goal) -> Goal:
+    goal = db.merge(goal)
+    db.commit()
+    db.refresh(goal)
+    return goal
+
+
 @router.get("/goals", response_model=GoalsResponse)
-async def get_goals(user_id: str, db: Session = Depends(get_db)):
-    goal = db.query(Goal).filter(Goal.user_id == user_id).first()
+async def get_goals(user_id: str, request: Request, db: AsyncDB = Depends(get_db)):
+    return await response_cache.serve(request, user_id, "goals", lambda: _build_goals(db, user_id))
+
+
+async def _build_goals(db: AsyncDB, user_id: str) -> GoalsResponse:
+    goal = await db.run(_get_goal, user_id)
     if not goal:
         return GoalsResponse(
             user_id=user_id,
@@ -35,7 +51,7 @@ async def get_goals(user_id: str, db: Session = Depends(get_db)):
 
 
 @router.post("/goals", response_model=GoalsResponse)
-async def set_goals(body: GoalsRequest, db: Session = Depends(get_db)):
+async def set_goals(body: GoalsRequest, db: AsyncDB = Depends(get_db)):
     goal = Goal(
         user_id=body.user_id,
         calories_goal=body.calories_goal,
@@ -45,9 +61,8 @@ async def set_goals(body: GoalsRequest, db: Session = Depends(get_db)):
         sugar_goal=body.sugar_goal,
         updated_at=datetime.now(),
     )
-    goal = db.merge(goal)
-    db.commit()
-    db.refresh(goal)
+    goal = await db.run(_save_goal, goal)
+    response_cache.bump(body.user_id)
     return GoalsResponse(
         user_id=goal.user_id,
         calories_goal=goal.calories_goal,
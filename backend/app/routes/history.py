@@ -0,0 +1,117 @@
+import base64
+import json
+from collections.abc import AsyncIterator
+from datetime import date, datetime
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select, tuple_
+
+from app.database import SessionLocal, run_sync
+from app.db_models import Meal
+from app.models import MealHistoryPage
+
+router = APIRouter(prefix="/api")
+
+_FETCH_SIZE = 200
+_MACROS = ("calories", "protein", "carbs", "fat", "sugar")
+
+
+def _encode_cursor(meal_date: date, created_at: datetime, meal_id: str) -> str:
+    raw = json.dumps([meal_date.isoformat(), created_at.isoformat(), meal_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        meal_date, created_at, meal_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(meal_date), datetime.fromisoformat(created_at), meal_id
+    except (ValueError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+
+
+def _page_query(
+    user_id: str, date_from: date | None, date_to: date | None, after: tuple | None, limit: int
+) -> Select:
+    stmt = select(
+        Meal.id,
+        Meal.meal_date,
+        Meal.text_input,
+        *(getattr(Meal, m) for m in _MACROS),
+        Meal.created_at,
+    ).where(Meal.user_id == user_id)
+    if date_from:
+        stmt = stmt.where(Meal.meal_date >= date_from)
+    if date_to:
+        stmt = stmt.where(Meal.meal_date <= date_to)
+    if after:
+        stmt = stmt.where(tuple_(Meal.meal_date, Meal.created_at, Meal.id) > tuple_(*after))
+    # One extra row tells us whether another page exists
+    return stmt.order_by(Meal.meal_date, Meal.created_at, Meal.id).limit(limit + 1)
+
+
+async def _stream_page(
+    user_id: str, stmt: Select, limit: int, subtotals: bool
+) -> AsyncIterator[str]:
+    session = SessionLocal()
+    try:
+        result = await run_sync(session.execute, stmt)
+        yield f'{{"user_id": {json.dumps(user_id)}, "meals": ['
+        days: dict[str, dict] = {}
+        sent = 0
+        last = None
+        next_cursor = None
+        while rows := await run_sync(result.fetchmany, _FETCH_SIZE):
+            for meal_id, meal_date, text_input, *macros, created_at in rows:
+                if sent == limit:
+                    next_cursor = _encode_cursor(*last)
+                    break
+                day = meal_date.isoformat()
+                meal = {
+                    "meal_id": meal_id,
+                    "user_id": user_id,
+                    "date": day,
+                    "text_input": text_input,
+                    **dict(zip(_MACROS, macros, strict=True)),
+                    "error": "",
+                    "created_at": created_at.isoformat(),
+                    "from_history": False,
+                }
+                yield ("," if sent else "") + json.dumps(meal)
+                sent += 1
+                last = (meal_date, created_at, meal_id)
+                if subtotals:
+                    entry = days.setdefault(
+                        day, {"date": day, "meal_count": 0, "totals": dict.fromkeys(_MACROS, 0)}
+                    )
+                    entry["meal_count"] += 1
+                    for name, value in zip(_MACROS, macros, strict=True):
+                        entry["totals"][name] += value
+            if next_cursor:
+                break
+        yield f'], "days": {json.dumps(list(days.values()))}, '
+        yield f'"next_cursor": {json.dumps(next_cursor)}}}'
+    finally:
+        await run_sync(session.close)
+
+
+@router.get("/meals", responses={200: {"model": MealHistoryPage}})
+async def list_meals(
+    user_id: str,
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    subtotals: bool = True,
+):
+    """Page through a user's meals in (date, created_at, id) order.
+
+    Pass ``next_cursor`` from the previous page as ``cursor`` to continue.
+    ``days`` sums the meals in this page only; a day split across pages
+    appears in both, and its subtotals add up.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    stmt = _page_query(user_id, date_from, date_to, after, limit)
+    return StreamingResponse(
+        _stream_page(user_id, stmt, limit, subtotals), media_type="application/json"
+    )
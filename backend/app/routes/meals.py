@@ -1,21 +1,58 @@
+import asyncio
 import logging
-from datetime import date, datetime
+import os
+import re
+from datetime import date, datetime, timedelta
+from difflib import SequenceMatcher
 from uuid import uuid4
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import exists, func, or_
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.db_models import Meal, User
-from app.models import MealResponse, MealSearchResult, MealUpdate, QuickMealCreate
-from app.openai_service import extract_macros
+from app import (
+    autocomplete,
+    idempotency,
+    images,
+    jobs,
+    metrics,
+    payload_log,
+    response_cache,
+    search,
+)
+from app.database import AsyncDB, SessionLocal, get_db, run_sync
+from app.db_models import ExtractionJob, Meal, User
+from app.models import (
+    BatchMealCreate,
+    BatchMealEntry,
+    BatchMealResponse,
+    BatchMealResult,
+    ExtractionJobResponse,
+    MealResponse,
+    MealSearchResult,
+    MealUpdate,
+    QuickMealCreate,
+)
+from app.openai_service import ExtractionResult, extract_macros, extract_meals, normalize_text
+from app.totals import apply_meal
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api")
 search_router = APIRouter(prefix="/api")
 
+# Similarity (0-1) every word of a submitted meal text needs against the same word
+# of a prior one to reuse its macros, which tolerates typos but not different
+# words; 1.0 only accepts matches that are identical after normalization.
+HISTORY_MATCH_THRESHOLD = float(os.environ.get("HISTORY_MATCH_THRESHOLD", "1.0"))
+# How many of the user's most recent distinct meal texts are compared
+HISTORY_MATCH_CANDIDATES = int(os.environ.get("HISTORY_MATCH_CANDIDATES", "500"))
+# Largest number of meals accepted by POST /api/meals/batch
+MEAL_BATCH_MAX_ITEMS = int(os.environ.get("MEAL_BATCH_MAX_ITEMS", "100"))
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
 
 def _meal_to_response(meal: Meal, error: str = "") -> MealResponse:
     return MealResponse(
@@ -33,37 +70,151 @@ def _meal_to_response(meal: Meal, error: str = "") -> MealResponse:
     )
 
 
-@search_router.get("/meals/search", response_model=list[MealSearchResult])
-async def search_meals(user_id: str, q: str = "", db: Session = Depends(get_db)):
-    if len(q) < 2:
-        return []
+def _user_exists(db: Session, user_id: str) -> bool:
+    return db.query(User.id).filter(User.id == user_id).first() is not None
 
-    # Subquery to get the max created_at per unique text_input
-    latest = (
-        db.query(
-            Meal.text_input,
-            func.max(Meal.created_at).label("max_created"),
-        )
-        .filter(
-            Meal.user_id == user_id,
-            Meal.text_input.isnot(None),
-            Meal.text_input != "",
-            Meal.text_input.ilike(f"%{q}%"),
-        )
-        .group_by(Meal.text_input)
-        .subquery()
+
+def _save_meal(db: Session, meal: Meal) -> Meal:
+    db.add(meal)
+    apply_meal(db, meal)
+    search.refresh_entry(db, meal.user_id, meal.text_input)
+    db.commit()
+    db.refresh(meal)
+    return meal
+
+
+def _save_meals(db: Session, meals: list[Meal]) -> list[Meal]:
+    """Insert several meals of one user in a single transaction."""
+    db.add_all(meals)
+    for meal in meals:
+        apply_meal(db, meal)
+    for text_input in {meal.text_input for meal in meals}:
+        search.refresh_entry(db, meals[0].user_id, text_input)
+    db.commit()
+    for meal in meals:
+        db.refresh(meal)
+    return meals
+
+
+def _get_meal(db: Session, meal_id: str) -> Meal | None:
+    return db.query(Meal).filter(Meal.id == meal_id).first()
+
+
+def _reusable(user_id: str) -> tuple:
+    """Filters for meals whose macros may be reused: not failed, not still extracting."""
+    return (
+        Meal.user_id == user_id,
+        Meal.text_input.isnot(None),
+        Meal.text_input != "",
+        # Failed extractions are saved with all-zero macros
+        or_(Meal.calories != 0, Meal.protein != 0, Meal.carbs != 0, Meal.fat != 0),
+        ~exists().where(ExtractionJob.meal_id == Meal.id, ExtractionJob.status != jobs.DONE),
     )
 
-    meals = (
+
+def _word_similarity(a: list[str], b: list[str]) -> float:
+    """Similarity of the least similar pair of words; texts of different length score 0."""
+    if len(a) != len(b):
+        return 0.0
+    return min(SequenceMatcher(None, x, y).ratio() for x, y in zip(a, b, strict=True))
+
+
+def _find_in_history(db: Session, user_id: str, text: str, threshold: float) -> Meal | None:
+    """Return the latest reusable meal whose text matches ``text`` closely enough, if any.
+
+    Texts equal after normalization are found by index among all of the
+    user's meals; near matches (``threshold`` below 1.0) only among the
+    ``HISTORY_MATCH_CANDIDATES`` most recent distinct texts.
+    """
+    wanted = normalize_text(text)
+    if not wanted:
+        return None
+    exact = (
         db.query(Meal)
-        .join(
-            latest,
-            (Meal.text_input == latest.c.text_input) & (Meal.created_at == latest.c.max_created),
-        )
+        .filter(*_reusable(user_id), Meal.text_key == wanted)
         .order_by(Meal.created_at.desc())
-        .limit(10)
+        .first()
+    )
+    if exact is not None or threshold >= 1.0:
+        return exact
+
+    candidates = (
+        db.query(Meal.text_input, func.max(Meal.created_at).label("max_created"))
+        .filter(*_reusable(user_id))
+        .group_by(Meal.text_input)
+        .order_by(func.max(Meal.created_at).desc())
+        .limit(HISTORY_MATCH_CANDIDATES)
         .all()
     )
+    # Near matches must agree on every quantity: "1 slice pizza" is not "2 slice pizza"
+    wanted_numbers = _NUMBER_RE.findall(wanted)
+    wanted_words = wanted.split()
+    best, best_ratio = None, threshold
+    for candidate, created in candidates:
+        normalized = normalize_text(candidate)
+        if _NUMBER_RE.findall(normalized) == wanted_numbers:
+            ratio = _word_similarity(wanted_words, normalized.split())
+            if ratio > best_ratio:
+                best, best_ratio = (candidate, created), ratio
+    if best is None:
+        return None
+
+    return (
+        db.query(Meal)
+        .filter(*_reusable(user_id), Meal.text_input == best[0], Meal.created_at == best[1])
+        .first()
+    )
+
+
+def _find_many_in_history(
+    db: Session, user_id: str, texts: list[str], threshold: float
+) -> dict[str, Meal]:
+    matches = {}
+    for text in set(texts):
+        prior = _find_in_history(db, user_id, text, threshold)
+        if prior:
+            matches[text] = prior
+    return matches
+
+
+def _update_meal(db: Session, meal_id: str, body: MealUpdate) -> Meal | None:
+    meal = _get_meal(db, meal_id)
+    if not meal:
+        return None
+    apply_meal(db, meal, -1)
+    meal.calories = body.calories
+    meal.protein = body.protein
+    meal.carbs = body.carbs
+    meal.fat = body.fat
+    meal.sugar = body.sugar
+    apply_meal(db, meal)
+    search.refresh_entry(db, meal.user_id, meal.text_input)
+    db.commit()
+    db.refresh(meal)
+    return meal
+
+
+def _delete_meal(db: Session, meal_id: str) -> str | None:
+    """Delete a meal and return its owner's id, or None if it does not exist."""
+    meal = _get_meal(db, meal_id)
+    if not meal:
+        return None
+    apply_meal(db, meal, -1)
+    db.delete(meal)
+    search.refresh_entry(db, meal.user_id, meal.text_input)
+    db.commit()
+    return meal.user_id
+
+
+@search_router.get("/meals/search", response_model=list[MealSearchResult])
+async def search_meals(user_id: str, q: str = "", db: AsyncDB = Depends(get_db)):
+    if len(q) < 2:
+        return []
+
+    if autocomplete.AUTOCOMPLETE_ENABLED:
+        meals = await autocomplete.search(user_id, q)
+    else:
+        meals = await db.run(search.search, user_id, q)
 
     return [
         MealSearchResult(
@@ -78,18 +229,53 @@ async def search_meals(user_id: str, q: str = "", db: Session = Depends(get_db))
     ]
 
 
-@router.post("/meal", response_model=MealResponse)
+def _job_response(job, meal: Meal | None) -> ExtractionJobResponse:
+    return ExtractionJobResponse(
+        job_id=job.meal_id,
+        status=job.status,
+        error=job.error,
+        meal=_meal_to_response(meal, error=job.error) if meal else None,
+    )
+
+
+@router.post(
+    "/meal",
+    response_model=MealResponse,
+    responses={202: {"model": ExtractionJobResponse}},
+)
 async def create_meal(
     user_id: str = Form(),
     text: str | None = Form(None),
     image: UploadFile | None = File(None),
     meal_date: str | None = Form(None),
-    db: Session = Depends(get_db),
+    use_history: bool = Form(True),
+    async_mode: bool = Form(False),
+    idempotency_key: str | None = Header(None),
+    db: AsyncDB = Depends(get_db),
 ):
+    image_hash = await images.content_hash(image) if image else None
+    request_fingerprint = idempotency.fingerprint(user_id, text, meal_date, image_hash, async_mode)
+    return await idempotency.run(
+        idempotency_key,
+        f"meal:{user_id}",
+        request_fingerprint,
+        lambda: _create_meal(db, user_id, text, image, meal_date, use_history, async_mode),
+    )
+
+
+async def _create_meal(
+    db: AsyncDB,
+    user_id: str,
+    text: str | None,
+    image: UploadFile | None,
+    meal_date: str | None,
+    use_history: bool,
+    async_mode: bool,
+) -> MealResponse | JSONResponse:
     if not text and not image:
         raise HTTPException(status_code=400, detail="Must provide text or image")
 
-    if not db.query(User).filter(User.id == user_id).first():
+    if not await db.run(_user_exists, user_id):
         raise HTTPException(status_code=404, detail="User not found")
 
     if meal_date:
@@ -97,8 +283,17 @@ async def create_meal(
     else:
         parsed_date = date.today()
 
-    image_bytes = await image.read() if image else None
-    logger.info(
+    image_bytes = None
+    if image:
+        try:
+            with metrics.span("image_read"):
+                raw_image = await images.read_upload(image)
+        except images.ImageTooLargeError as exc:
+            raise HTTPException(status_code=413, detail=str(exc)) from exc
+        with metrics.span("image_prepare"):
+            image_bytes = (await asyncio.to_thread(images.prepare, raw_image)).data
+    payload_log.log(
+        logger,
         "create_meal: user_id=%s text=%s has_image=%s date=%s",
         user_id,
         repr(text),
@@ -106,8 +301,51 @@ async def create_meal(
         parsed_date,
     )
 
-    result = await extract_macros(text, image_bytes)
-    logger.info(
+    prior = None
+    if use_history and text and not image_bytes:
+        prior = await db.run(_find_in_history, user_id, text, HISTORY_MATCH_THRESHOLD)
+
+    if prior:
+        payload_log.log(
+            logger,
+            "create_meal: reusing macros from meal %s (%s)",
+            prior.id,
+            repr(prior.text_input),
+        )
+        result = ExtractionResult(
+            calories=prior.calories,
+            protein=prior.protein,
+            carbs=prior.carbs,
+            fat=prior.fat,
+            sugar=prior.sugar,
+            error="",
+            description=text,
+        )
+    elif async_mode:
+        meal = Meal(
+            id=str(uuid4()),
+            user_id=user_id,
+            meal_date=parsed_date,
+            text_input=text or None,
+            calories=0,
+            protein=0.0,
+            carbs=0.0,
+            fat=0.0,
+            sugar=0.0,
+            created_at=datetime.now(),
+        )
+        await db.run(jobs.add_job, meal, text, image_bytes)
+        response_cache.bump(user_id)
+        jobs.submit(meal.id)
+        logger.info("create_meal: queued extraction job %s", meal.id)
+        body = ExtractionJobResponse(
+            job_id=meal.id, status=jobs.PENDING, meal=_meal_to_response(meal)
+        )
+        return JSONResponse(status_code=202, content=body.model_dump())
+    else:
+        result = await extract_macros(text, image_bytes, user_id=user_id)
+    payload_log.log(
+        logger,
         "create_meal: extraction result — cal=%d pro=%.1f carbs=%.1f fat=%.1f sugar=%.1f error=%r",
         result.calories,
         result.protein,
@@ -131,16 +369,74 @@ async def create_meal(
         sugar=result.sugar,
         created_at=datetime.now(),
     )
-    db.add(meal)
-    db.commit()
-    db.refresh(meal)
+    meal = await db.run(_save_meal, meal)
+    response_cache.bump(user_id)
     logger.info("create_meal: saved meal %s", meal.id)
-    return _meal_to_response(meal, error=result.error)
+    response = _meal_to_response(meal, error=result.error)
+    response.from_history = prior is not None
+    return response
+
+
+@router.get("/meal/{meal_id}/status", response_model=ExtractionJobResponse)
+async def get_meal_status(meal_id: str, db: AsyncDB = Depends(get_db)):
+    job, meal = await db.run(jobs.get_job, meal_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job, meal)
+
+
+def _read_job(meal_id: str) -> ExtractionJobResponse | None:
+    # The SSE stream outlives the request-scoped session, so it reads with its own
+    with SessionLocal() as db:
+        job, meal = jobs.get_job(db, meal_id)
+        return _job_response(job, meal) if job else None
+
+
+@router.get("/meal/{meal_id}/events")
+async def stream_meal_status(meal_id: str):
+    """Server-Sent Events stream of job status updates, ending at done/failed."""
+    updates = jobs.subscribe(meal_id)
+    if not await run_sync(_read_job, meal_id):
+        jobs.unsubscribe(meal_id, updates)
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        try:
+            while True:
+                status = await run_sync(_read_job, meal_id)
+                if status is None:
+                    return
+                yield f"event: status\ndata: {status.model_dump_json()}\n\n"
+                if status.status in jobs.TERMINAL:
+                    return
+                while True:
+                    try:
+                        await asyncio.wait_for(updates.get(), timeout=15)
+                        break
+                    except TimeoutError:
+                        yield ": keep-alive\n\n"
+        finally:
+            jobs.unsubscribe(meal_id, updates)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 
 @router.post("/meal/quick", response_model=MealResponse)
-async def quick_create_meal(body: QuickMealCreate, db: Session = Depends(get_db)):
-    if not db.query(User).filter(User.id == body.user_id).first():
+async def quick_create_meal(
+    body: QuickMealCreate,
+    idempotency_key: str | None = Header(None),
+    db: AsyncDB = Depends(get_db),
+):
+    return await idempotency.run(
+        idempotency_key,
+        f"meal/quick:{body.user_id}",
+        idempotency.fingerprint(body.model_dump_json()),
+        lambda: _quick_create_meal(db, body),
+    )
+
+
+async def _quick_create_meal(db: AsyncDB, body: QuickMealCreate) -> MealResponse:
+    if not await db.run(_user_exists, body.user_id):
         raise HTTPException(status_code=404, detail="User not found")
 
     meal = Meal(
@@ -155,32 +451,195 @@ async def quick_create_meal(body: QuickMealCreate, db: Session = Depends(get_db)
         sugar=body.sugar,
         created_at=datetime.now(),
     )
-    db.add(meal)
-    db.commit()
-    db.refresh(meal)
+    meal = await db.run(_save_meal, meal)
+    response_cache.bump(body.user_id)
     return _meal_to_response(meal)
 
 
+@router.post("/meal/multi", response_model=list[MealResponse])
+async def create_meals_from_text(
+    user_id: str = Form(),
+    text: str = Form(),
+    meal_date: str | None = Form(None),
+    idempotency_key: str | None = Header(None),
+    db: AsyncDB = Depends(get_db),
+):
+    """Split a description of several meals into separate meals with one extraction call.
+
+    If extraction fails, a single zero-macro meal with the whole text and the
+    error is saved, as ``POST /api/meal`` does.
+    """
+    return await idempotency.run(
+        idempotency_key,
+        f"meal/multi:{user_id}",
+        idempotency.fingerprint(user_id, text, meal_date),
+        lambda: _create_meals_from_text(db, user_id, text, meal_date),
+    )
+
+
+async def _create_meals_from_text(
+    db: AsyncDB, user_id: str, text: str, meal_date: str | None
+) -> list[MealResponse]:
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Must provide text")
+    if not await db.run(_user_exists, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    parsed_date = date.fromisoformat(meal_date) if meal_date else date.today()
+
+    result = await extract_meals(text, user_id=user_id)
+    logger.info(
+        "create_meals_from_text: user_id=%s meals=%d error=%r",
+        user_id,
+        len(result.items),
+        result.error,
+    )
+    items = result.items or [
+        ExtractionResult(calories=0, protein=0.0, carbs=0.0, fat=0.0, sugar=0.0, error="")
+    ]
+    now = datetime.now()
+    meals = [
+        Meal(
+            id=str(uuid4()),
+            user_id=user_id,
+            meal_date=parsed_date,
+            text_input=item.description or text,
+            calories=item.calories,
+            protein=item.protein,
+            carbs=item.carbs,
+            fat=item.fat,
+            sugar=item.sugar,
+            # Distinct timestamps keep the meals in the order they were described
+            created_at=now + timedelta(microseconds=i),
+        )
+        for i, item in enumerate(items)
+    ]
+    meals = await db.run(_save_meals, meals)
+    response_cache.bump(user_id)
+    return [_meal_to_response(meal, error=result.error) for meal in meals]
+
+
+@router.post("/meals/batch", response_model=BatchMealResponse)
+async def create_meals_batch(
+    body: BatchMealCreate,
+    idempotency_key: str | None = Header(None),
+    db: AsyncDB = Depends(get_db),
+):
+    """Log many meals at once: quick entries as given, the rest extracted concurrently.
+
+    All meals that succeed are inserted in one transaction; entries with an
+    invalid date or a failed extraction are reported in their result and not
+    saved.
+    """
+    return await idempotency.run(
+        idempotency_key,
+        f"meals/batch:{body.user_id}",
+        idempotency.fingerprint(body.model_dump_json()),
+        lambda: _create_meals_batch(db, body),
+    )
+
+
+def _is_quick(entry: BatchMealEntry) -> bool:
+    macros = (entry.calories, entry.protein, entry.carbs, entry.fat, entry.sugar)
+    return all(value is not None for value in macros)
+
+
+async def _create_meals_batch(db: AsyncDB, body: BatchMealCreate) -> BatchMealResponse:
+    if not body.meals:
+        raise HTTPException(status_code=400, detail="No meals given")
+    if len(body.meals) > MEAL_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MEAL_BATCH_MAX_ITEMS} meals per batch"
+        )
+    if not await db.run(_user_exists, body.user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+
+    results = [BatchMealResult(index=i) for i in range(len(body.meals))]
+    dates: dict[int, date] = {}
+    for i, entry in enumerate(body.meals):
+        try:
+            dates[i] = date.fromisoformat(entry.meal_date) if entry.meal_date else date.today()
+        except ValueError as exc:
+            results[i].error = str(exc)
+        if not entry.text_input.strip():
+            results[i].error = "Must provide text_input"
+    valid = [i for i in range(len(body.meals)) if not results[i].error]
+
+    to_extract = [i for i in valid if not _is_quick(body.meals[i])]
+    prior: dict[str, Meal] = {}
+    if body.use_history and to_extract:
+        texts = [body.meals[i].text_input for i in to_extract]
+        prior = await db.run(_find_many_in_history, body.user_id, texts, HISTORY_MATCH_THRESHOLD)
+    pending = [i for i in to_extract if body.meals[i].text_input not in prior]
+    # The scheduler bounds concurrency and single-flight merges repeated texts
+    extracted = dict(
+        zip(
+            pending,
+            await asyncio.gather(
+                *(
+                    extract_macros(body.meals[i].text_input, None, user_id=body.user_id)
+                    for i in pending
+                )
+            ),
+            strict=True,
+        )
+    )
+    logger.info(
+        "create_meals_batch: user_id=%s meals=%d extracted=%d from_history=%d",
+        body.user_id,
+        len(body.meals),
+        len(pending),
+        len(to_extract) - len(pending),
+    )
+
+    meals: dict[int, Meal] = {}
+    now = datetime.now()
+    for i in valid:
+        entry = body.meals[i]
+        if _is_quick(entry):
+            source = entry
+        elif entry.text_input in prior:
+            source = prior[entry.text_input]
+        elif extracted[i].error:
+            results[i].error = extracted[i].error
+            continue
+        else:
+            source = extracted[i]
+        meals[i] = Meal(
+            id=str(uuid4()),
+            user_id=body.user_id,
+            meal_date=dates[i],
+            text_input=entry.text_input,
+            calories=source.calories,
+            protein=source.protein,
+            carbs=source.carbs,
+            fat=source.fat,
+            sugar=source.sugar,
+            # Distinct timestamps keep same-day meals in the order they were sent
+            created_at=now + timedelta(microseconds=i),
+        )
+
+    if meals:
+        await db.run(_save_meals, list(meals.values()))
+        response_cache.bump(body.user_id)
+    for i, meal in meals.items():
+        results[i].meal = _meal_to_response(meal)
+        results[i].meal.from_history = i in to_extract and i not in extracted
+    return BatchMealResponse(user_id=body.user_id, results=results)
+
+
 @router.put("/meal/{meal_id}", response_model=MealResponse)
-async def update_meal(meal_id: str, body: MealUpdate, db: Session = Depends(get_db)):
-    meal = db.query(Meal).filter(Meal.id == meal_id).first()
+async def update_meal(meal_id: str, body: MealUpdate, db: AsyncDB = Depends(get_db)):
+    meal = await db.run(_update_meal, meal_id, body)
     if not meal:
         raise HTTPException(status_code=404, detail="Meal not found")
-    meal.calories = body.calories
-    meal.protein = body.protein
-    meal.carbs = body.carbs
-    meal.fat = body.fat
-    meal.sugar = body.sugar
-    db.commit()
-    db.refresh(meal)
+    response_cache.bump(meal.user_id)
     return _meal_to_response(meal)
 
 
 @router.delete("/meal/{meal_id}")
-async def delete_meal(meal_id: str, db: Session = Depends(get_db)):
-    meal = db.query(Meal).filter(Meal.id == meal_id).first()
-    if not meal:
+async def delete_meal(meal_id: str, db: AsyncDB = Depends(get_db)):
+    user_id = await db.run(_delete_meal, meal_id)
+    if not user_id:
         raise HTTPException(status_code=404, detail="Meal not found")
-    db.delete(meal)
-    db.commit()
+    response_cache.bump(user_id)
     return {"deleted": True}
@@ -0,0 +1,251 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Iterator
+from datetime import date, datetime
+from typing import Literal
+from uuid import uuid4
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app import response_cache, search
+from app.database import AsyncDB, SessionLocal, get_db, run_sync
+from app.db_models import Meal, User
+from app.models import ImportResult
+from app.totals import apply_delta
+
+router = APIRouter(prefix="/api")
+
+_FETCH_SIZE = 1000
+_BATCH_SIZE = 1000
+_MAX_REPORTED_ERRORS = 100
+_MACROS = ("calories", "protein", "carbs", "fat", "sugar")
+_COLUMNS = ("meal_id", "date", "text_input", *_MACROS, "created_at")
+
+Format = Literal["ndjson", "csv"]
+
+
+def _format_rows(rows, fmt: Format) -> str:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps(
+                {
+                    "meal_id": meal_id,
+                    "date": meal_date.isoformat(),
+                    "text_input": text_input,
+                    **dict(zip(_MACROS, macros, strict=True)),
+                    "created_at": created_at.isoformat(),
+                }
+            )
+            + "\n"
+            for meal_id, meal_date, text_input, *macros, created_at in rows
+        )
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for meal_id, meal_date, text_input, *macros, created_at in rows:
+        writer.writerow(
+            [meal_id, meal_date.isoformat(), text_input, *macros, created_at.isoformat()]
+        )
+    return out.getvalue()
+
+
+async def _stream_export(user_id: str, fmt: Format) -> AsyncIterator[str]:
+    stmt = (
+        select(
+            Meal.id,
+            Meal.meal_date,
+            Meal.text_input,
+            *(getattr(Meal, m) for m in _MACROS),
+            Meal.created_at,
+        )
+        .where(Meal.user_id == user_id)
+        .order_by(Meal.meal_date, Meal.created_at, Meal.id)
+        .execution_options(yield_per=_FETCH_SIZE)
+    )
+    session = SessionLocal()
+    try:
+        result = await run_sync(session.execute, stmt)
+        if fmt == "csv":
+            yield ",".join(_COLUMNS) + "\r\n"
+        while rows := await run_sync(result.fetchmany, _FETCH_SIZE):
+            yield _format_rows(rows, fmt)
+    finally:
+        await run_sync(session.close)
+
+
+@router.get("/export")
+async def export_meals(user_id: str, format: Format = "ndjson"):
+    """Stream every meal of a user as NDJSON or CSV, in constant memory."""
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(
+        _stream_export(user_id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="meals.{format}"'},
+    )
+
+
+def _read_records(upload: UploadFile, fmt: Format) -> Iterator[tuple[int, dict | str | Exception]]:
+    """Yield ``(record number, record)`` pairs; NDJSON lines are left for the caller to parse.
+
+    Unreadable records are yielded as the exception to report: a row the CSV
+    reader rejects as its ``csv.Error``, a line that is not UTF-8 as a
+    ``ValueError``. In CSV an undecodable line ends the records, since a
+    quoted field may continue past it.
+    """
+    if fmt == "ndjson":
+        for number, raw in enumerate(upload.file, start=1):
+            try:
+                line = raw.decode("utf-8")
+            except UnicodeDecodeError as exc:
+                yield number, ValueError(f"invalid UTF-8 at byte {exc.start}")
+                continue
+            if line.strip():
+                yield number, line
+        return
+
+    undecodable: list[ValueError] = []
+
+    def lines() -> Iterator[str]:
+        for line_number, raw in enumerate(upload.file, start=1):
+            try:
+                yield raw.decode("utf-8")
+            except UnicodeDecodeError as exc:
+                undecodable.append(
+                    ValueError(f"invalid UTF-8 on line {line_number} at byte {exc.start}")
+                )
+                return
+
+    reader = csv.DictReader(lines())
+    number = 0
+    while True:
+        number += 1
+        try:
+            yield number, next(reader)
+        except StopIteration:
+            break
+        except csv.Error as exc:
+            yield number, exc
+    if undecodable:
+        yield number, undecodable[0]
+
+
+def _user_exists(db: Session, user_id: str) -> bool:
+    return db.get(User, user_id) is not None
+
+
+def _to_row(user_id: str, record: dict, now: datetime) -> dict:
+    if not isinstance(record, dict):
+        raise TypeError(f"expected an object, got {type(record).__name__}")
+    created_at = record.get("created_at")
+    return {
+        "id": record.get("meal_id") or str(uuid4()),
+        "user_id": user_id,
+        "meal_date": date.fromisoformat(record["date"]),
+        "text_input": record.get("text_input") or None,
+        "calories": int(float(record["calories"])),
+        "protein": float(record["protein"]),
+        "carbs": float(record["carbs"]),
+        "fat": float(record["fat"]),
+        "sugar": float(record["sugar"]),
+        "created_at": datetime.fromisoformat(created_at) if created_at else now,
+    }
+
+
+def _insert_batch(db: Session, user_id: str, rows: list[dict]) -> int:
+    """Insert one batch with executemany and fold it into totals and search. Returns skips.
+
+    Rows whose id is already one of this user's meals are skipped; ids taken
+    by another user's meal (an export imported into a different account) are
+    replaced with fresh ones.
+    """
+    owners = dict(
+        db.execute(select(Meal.id, Meal.user_id).where(Meal.id.in_([r["id"] for r in rows]))).all()
+    )
+    existing = {meal_id for meal_id, owner in owners.items() if owner == user_id}
+    rows = [r for r in rows if r["id"] not in existing]
+    for row in rows:
+        if row["id"] in owners:
+            row["id"] = str(uuid4())
+    if rows:
+        db.execute(insert(Meal), rows)
+
+        days: dict[date, list] = {}
+        for row in rows:
+            day = days.setdefault(row["meal_date"], [0, dict.fromkeys(_MACROS, 0)])
+            day[0] += 1
+            for m in _MACROS:
+                day[1][m] += row[m]
+        for meal_date, (count, values) in days.items():
+            apply_delta(db, user_id, meal_date, count, values)
+
+        search.merge_entries(db, user_id, rows)
+    db.commit()
+    return len(existing)
+
+
+def _read_batch(
+    records: Iterator[tuple[int, dict | str | Exception]],
+    user_id: str,
+    now: datetime,
+    result: ImportResult,
+) -> list[dict]:
+    """Parse records until a batch is full; an empty batch means the upload is exhausted.
+
+    Invalid records are counted in ``result`` as skipped, with their errors.
+    """
+    batch: list[dict] = []
+    seen_ids: set[str] = set()
+    for number, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if isinstance(record, str):
+                record = json.loads(record)
+            row = _to_row(user_id, record, now)
+        except (KeyError, TypeError, ValueError, csv.Error) as exc:
+            result.skipped += 1
+            if len(result.errors) < _MAX_REPORTED_ERRORS:
+                result.errors.append(f"record {number}: {exc!r}")
+            continue
+        if row["id"] in seen_ids:
+            result.skipped += 1
+            continue
+        seen_ids.add(row["id"])
+        batch.append(row)
+        if len(batch) >= _BATCH_SIZE:
+            break
+    return batch
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_meals(
+    user_id: str,
+    file: UploadFile = File(),
+    format: Format = Query("ndjson"),
+    db: AsyncDB = Depends(get_db),
+):
+    """Load meals from an NDJSON or CSV export into a user, in batched transactions.
+
+    Rows whose ``meal_id`` is already one of the user's meals are skipped, so
+    re-importing a backup is harmless; rows without one, or whose id belongs
+    to another user, get a new id. Records that cannot be parsed are skipped
+    and reported in ``errors``; each batch commits on its own.
+    """
+    if not await db.run(_user_exists, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    result = ImportResult(imported=0, skipped=0, errors=[])
+    records = _read_records(file, format)
+    now = datetime.now()
+    try:
+        # One executor call per batch, so a large upload does not hold a DB
+        # worker for its whole duration
+        while batch := await run_sync(_read_batch, records, user_id, now, result):
+            skipped = await db.run(_insert_batch, user_id, batch)
+            result.imported += len(batch) - skipped
+            result.skipped += skipped
+    finally:
+        response_cache.bump(user_id)
+    return result
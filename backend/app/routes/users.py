@@ -4,23 +4,31 @@ from uuid import uuid4
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import AsyncDB, get_db
 from app.db_models import User
 from app.models import UserCreate, UserResponse
 
 router = APIRouter(prefix="/api")
 
 
+def _list_users(db: Session) -> list[User]:
+    return db.query(User).order_by(User.created_at).all()
+
+
+def _add(db: Session, obj):
+    db.add(obj)
+    db.commit()
+    db.refresh(obj)
+    return obj
+
+
 @router.get("/users", response_model=list[UserResponse])
-async def list_users(db: Session = Depends(get_db)):
-    users = db.query(User).order_by(User.created_at).all()
+async def list_users(db: AsyncDB = Depends(get_db)):
+    users = await db.run(_list_users)
     return [UserResponse(id=u.id, name=u.name, created_at=u.created_at.isoformat()) for u in users]
 
 
 @router.post("/users", response_model=UserResponse)
-async def create_user(body: UserCreate, db: Session = Depends(get_db)):
-    user = User(id=str(uuid4()), name=body.name, created_at=datetime.now())
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+async def create_user(body: UserCreate, db: AsyncDB = Depends(get_db)):
+    user = await db.run(_add, User(id=str(uuid4()), name=body.name, created_at=datetime.now()))
     return UserResponse(id=user.id, name=user.name, created_at=user.created_at.isoformat())
@@ -1,16 +1,49 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.db_models import Goal, Meal
+from app import response_cache
+from app.database import AsyncDB, get_db
+from app.db_models import DailyTotal, Goal
 from app.models import DayEntry, DayGoal, MacroTotals, WeeklyResponse
 
 router = APIRouter(prefix="/api")
 
 
-@router.get("/weekly", response_model=WeeklyResponse)
-async def get_weekly(user_id: str, db: Session = Depends(get_db)):
+def _load_summary(db: Session, user_id: str, days: int):
+    """Return the goal and per-day macro totals for the most recent ``days`` logged dates."""
     goal = db.query(Goal).filter(Goal.user_id == user_id).first()
+
+    rows = (
+        db.query(
+            DailyTotal.meal_date,
+            DailyTotal.calories,
+            DailyTotal.protein,
+            DailyTotal.carbs,
+            DailyTotal.fat,
+            DailyTotal.sugar,
+        )
+        .filter(DailyTotal.user_id == user_id)
+        .order_by(DailyTotal.meal_date.desc())
+        .limit(days)
+        .all()
+    )
+    return goal, sorted(rows)
+
+
+@router.get("/weekly", response_model=WeeklyResponse)
+async def get_weekly(
+    user_id: str,
+    request: Request,
+    days: int = Query(7, ge=7, le=365),
+    db: AsyncDB = Depends(get_db),
+):
+    return await response_cache.serve(
+        request, user_id, f"weekly:{days}", lambda: _build_weekly(db, user_id, days)
+    )
+
+
+async def _build_weekly(db: AsyncDB, user_id: str, days: int) -> WeeklyResponse:
+    goal, rows = await db.run(_load_summary, user_id, days)
     goal_data = DayGoal(
         calories=goal.calories_goal if goal else 0,
         protein=goal.protein_goal if goal else 0.0,
@@ -19,26 +52,13 @@ async def get_weekly(user_id: str, db: Session = Depends(get_db)):
         sugar=goal.sugar_goal if goal else 0.0,
     )
 
-    meal_dates = (
-        db.query(Meal.meal_date)
-        .filter(Meal.user_id == user_id)
-        .group_by(Meal.meal_date)
-        .order_by(Meal.meal_date.desc())
-        .limit(7)
-        .all()
-    )
-    dates = sorted([row[0] for row in meal_dates])
-
-    days = []
-    for d in dates:
-        meals = db.query(Meal).filter(Meal.user_id == user_id, Meal.meal_date == d).all()
-        actual = MacroTotals(
-            calories=sum(m.calories for m in meals),
-            protein=sum(m.protein for m in meals),
-            carbs=sum(m.carbs for m in meals),
-            fat=sum(m.fat for m in meals),
-            sugar=sum(m.sugar for m in meals),
+    entries = [
+        DayEntry(
+            date=str(d),
+            goal=goal_data,
+            actual=MacroTotals(calories=cal, protein=pro, carbs=carbs, fat=fat, sugar=sugar),
         )
-        days.append(DayEntry(date=str(d), goal=goal_data, actual=actual))
+        for d, cal, pro, carbs, fat, sugar in rows
+    ]
 
-    return WeeklyResponse(user_id=user_id, days=days)
+    return WeeklyResponse(user_id=user_id, days=entries)
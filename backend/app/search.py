@@ -0,0 +1,166 @@
+"""Meal text search backed by the ``meal_search`` FTS5 index.
+
+``meal_search_entries`` holds one row per distinct ``(user_id, text_input)``
+with that text's latest macros; triggers mirror it into the FTS index. Every
+meal write calls :func:`refresh_entry` in its own transaction so both stay in
+sync with ``meals``. Each refresh is also recorded under
+``PENDING_UPDATES_KEY`` in ``session.info`` so in-memory indexes can follow
+once the transaction commits.
+"""
+
+import re
+
+from sqlalchemy import case, delete, func, select, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.db_models import ExtractionJob, Meal, MealSearchEntry
+from app.openai_service import normalize_text
+
+# Weight of the recency bonus relative to BM25 (lower scores rank first)
+RECENCY_WEIGHT = 2.0
+
+PENDING_UPDATES_KEY = "meal_search_updates"
+
+_MACROS = ("calories", "protein", "carbs", "fat", "sugar")
+_VALUES = (*_MACROS, "last_used_at")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# jobs.PENDING and jobs.RUNNING (jobs imports this module): placeholder meals
+# whose macros are not known yet
+_UNFINISHED_JOB_STATUSES = ("pending", "running")
+
+_SEARCH_SQL = text(
+    """
+    SELECT e.text_input, e.calories, e.protein, e.carbs, e.fat, e.sugar
+    FROM meal_search s JOIN meal_search_entries e ON e.id = s.rowid AND e.user_id = :user_id
+    WHERE meal_search MATCH :query
+    ORDER BY bm25(meal_search, 1.0, 0.0)
+        - :recency / (1 + julianday('now') - julianday(e.last_used_at))
+    LIMIT :limit
+    """
+)
+
+
+def tokenize(value: str) -> list[str]:
+    return _TOKEN_RE.findall(value.lower())
+
+
+def _record(db: Session, user_id: str, text_input: str, values: dict | None):
+    db.info.setdefault(PENDING_UPDATES_KEY, []).append((user_id, text_input, values))
+
+
+def refresh_entry(db: Session, user_id: str, text_input: str | None):
+    """Recompute the search entry for one meal text from the meals table."""
+    if not text_input:
+        return
+    db.flush()
+    finished = (
+        ~select(ExtractionJob.meal_id)
+        .where(ExtractionJob.meal_id == Meal.id, ExtractionJob.status.in_(_UNFINISHED_JOB_STATUSES))
+        .exists()
+    )
+    latest = db.execute(
+        select(Meal)
+        .where(Meal.user_id == user_id, Meal.text_input == text_input, finished)
+        .order_by(Meal.created_at.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+    if latest is None:
+        db.execute(
+            delete(MealSearchEntry).where(
+                MealSearchEntry.user_id == user_id, MealSearchEntry.text_input == text_input
+            )
+        )
+        _record(db, user_id, text_input, None)
+        return
+
+    uses = db.scalar(
+        select(func.count()).where(Meal.user_id == user_id, Meal.text_input == text_input, finished)
+    )
+    values = {
+        "calories": latest.calories,
+        "protein": latest.protein,
+        "carbs": latest.carbs,
+        "fat": latest.fat,
+        "sugar": latest.sugar,
+        "last_used_at": latest.created_at,
+        "use_count": uses,
+    }
+    stmt = insert(MealSearchEntry).values(user_id=user_id, text_input=text_input, **values)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[MealSearchEntry.user_id, MealSearchEntry.text_input], set_=values
+        )
+    )
+    _record(db, user_id, text_input, values)
+
+
+def merge_entries(db: Session, user_id: str, meals: list[dict]):
+    """Fold newly inserted meal rows into the search entries without rescanning ``meals``.
+
+    Equivalent to :func:`refresh_entry` for each text, for rows that are only
+    ever added: use counts are summed and the newest row's macros win.
+    """
+    latest: dict[str, dict] = {}
+    uses: dict[str, int] = {}
+    for meal in meals:
+        text_input = meal["text_input"]
+        if not text_input:
+            continue
+        uses[text_input] = uses.get(text_input, 0) + 1
+        if text_input not in latest or meal["created_at"] >= latest[text_input]["created_at"]:
+            latest[text_input] = meal
+    if not latest:
+        return
+
+    stmt = insert(MealSearchEntry)
+    newer = stmt.excluded.last_used_at >= MealSearchEntry.last_used_at
+    set_ = {m: case((newer, stmt.excluded[m]), else_=getattr(MealSearchEntry, m)) for m in _VALUES}
+    set_["use_count"] = MealSearchEntry.use_count + stmt.excluded.use_count
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[MealSearchEntry.user_id, MealSearchEntry.text_input], set_=set_
+        ),
+        [
+            {
+                "user_id": user_id,
+                "text_input": text_input,
+                **{m: meal[m] for m in _MACROS},
+                "last_used_at": meal["created_at"],
+                "use_count": uses[text_input],
+            }
+            for text_input, meal in latest.items()
+        ],
+    )
+    entries = db.execute(
+        select(MealSearchEntry).where(
+            MealSearchEntry.user_id == user_id, MealSearchEntry.text_input.in_(latest)
+        )
+    ).scalars()
+    for entry in entries:
+        values = {k: getattr(entry, k) for k in (*_VALUES, "use_count")}
+        _record(db, user_id, entry.text_input, values)
+
+
+def _quote(token: str) -> str:
+    return '"' + token.replace('"', '""') + '"'
+
+
+def search(db: Session, user_id: str, q: str, limit: int = 10) -> list:
+    """Prefix-match every token of ``q`` against the user's meal texts, best first."""
+    tokens = tokenize(q)
+    if not tokens:
+        return []
+    terms = " AND ".join(f"{_quote(token)}*" for token in tokens)
+    # The user_id phrase only narrows the match set: it also matches ids that
+    # merely contain the same token sequence, so the join checks the exact id
+    query = f"user_id:{_quote(user_id)} AND text_input:({terms})"
+    # Entries are per exact text; keep the best-ranked spelling of each normalized one
+    params = {"query": query, "user_id": user_id, "recency": RECENCY_WEIGHT, "limit": limit * 3}
+    rows = db.execute(_SEARCH_SQL, params).all()
+    distinct = {}
+    for row in rows:
+        distinct.setdefault(normalize_text(row.text_input), row)
+    return list(distinct.values())[:limit]
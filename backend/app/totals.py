@@ -0,0 +1,109 @@
+"""Maintenance of the materialized ``daily_totals`` table.
+
+Meal write paths call :func:`apply_meal` before committing so the per-day sums
+stay in step with ``meals``. Run ``python -m app.totals verify`` to compare the
+table against a fresh aggregation, or ``rebuild`` to recompute it.
+"""
+
+import argparse
+import sys
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.db_models import DailyTotal, Meal
+
+_MACROS = ("calories", "protein", "carbs", "fat", "sugar")
+
+
+def apply_delta(db: Session, user_id: str, meal_date, meal_count: int, values: dict):
+    """Add ``meal_count`` meals and the given macro sums to one day's totals."""
+    stmt = insert(DailyTotal).values(
+        user_id=user_id, meal_date=meal_date, meal_count=meal_count, **values
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyTotal.user_id, DailyTotal.meal_date],
+        set_={
+            "meal_count": DailyTotal.meal_count + stmt.excluded.meal_count,
+            **{m: getattr(DailyTotal, m) + getattr(stmt.excluded, m) for m in _MACROS},
+        },
+    )
+    db.execute(stmt)
+    if meal_count < 0:
+        db.execute(
+            delete(DailyTotal).where(
+                DailyTotal.user_id == user_id,
+                DailyTotal.meal_date == meal_date,
+                DailyTotal.meal_count <= 0,
+            )
+        )
+
+
+def apply_meal(db: Session, meal: Meal, sign: int = 1):
+    """Add (``sign=1``) or remove (``sign=-1``) a meal's macros from its day's totals."""
+    values = {m: sign * getattr(meal, m) for m in _MACROS}
+    apply_delta(db, meal.user_id, meal.meal_date, sign, values)
+
+
+def _aggregate():
+    return select(
+        Meal.user_id,
+        Meal.meal_date,
+        func.count(),
+        *(func.sum(getattr(Meal, m)) for m in _MACROS),
+    ).group_by(Meal.user_id, Meal.meal_date)
+
+
+def rebuild(db: Session):
+    """Recompute every row of ``daily_totals`` from ``meals``."""
+    db.execute(delete(DailyTotal))
+    db.execute(
+        insert(DailyTotal).from_select(
+            ["user_id", "meal_date", "meal_count", *_MACROS], _aggregate()
+        )
+    )
+    db.commit()
+
+
+def verify(db: Session, tolerance: float = 0.01) -> list[str]:
+    """Return a description of every day whose stored totals disagree with ``meals``."""
+    expected = {(row[0], row[1]): row[2:] for row in db.execute(_aggregate())}
+    stored = {
+        (t.user_id, t.meal_date): (t.meal_count, *(getattr(t, m) for m in _MACROS))
+        for t in db.query(DailyTotal)
+    }
+    problems = []
+    for key in expected.keys() | stored.keys():
+        want, have = expected.get(key), stored.get(key)
+        if (
+            want is None
+            or have is None
+            or any(abs(w - h) > tolerance for w, h in zip(want, have, strict=True))
+        ):
+            problems.append(f"user={key[0]} date={key[1]} expected={want} stored={have}")
+    return problems
+
+
+def main():
+    from app.database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args()
+
+    init_db()
+    with SessionLocal() as db:
+        if args.command == "rebuild":
+            rebuild(db)
+            print("daily_totals rebuilt")
+            return
+        problems = verify(db)
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} mismatched day(s)")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Shared setup for the benchmark scripts.
+
+Importing this module points the app at a fresh temporary database and puts
+the backend on ``sys.path``, so it must be imported before anything from
+``app``. Model calls go to :class:`FakeClient`, which answers after a fixed
+delay, so a run measures the backend rather than the OpenAI API.
+"""
+
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="brotein-bench-"), "db"))
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+# Per-request INFO logs would dominate the timings
+logging.disable(logging.INFO)
+
+import httpx  # noqa: E402
+
+_ANSWER = {
+    "reasoning": "",
+    "calories": 400,
+    "protein": 30.0,
+    "carbs": 40.0,
+    "fat": 13.3,
+    "sugar": 5.0,
+    "error": "",
+    "description": "",
+}
+
+
+class FakeClient:
+    """Stands in for ``AsyncOpenAI``: every completion takes ``latency`` seconds."""
+
+    def __init__(self, latency: float):
+        import asyncio
+
+        async def create(**kwargs):
+            self.calls += 1
+            await asyncio.sleep(self.latency)
+            message = SimpleNamespace(content=json.dumps(_ANSWER))
+            usage = SimpleNamespace(
+                prompt_tokens=900, completion_tokens=80, prompt_tokens_details=None
+            )
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+    async def close(self):
+        pass
+
+
+def install_fake_client(latency: float) -> FakeClient:
+    from app import openai_service
+
+    fake = FakeClient(latency)
+    openai_service._client = fake
+    return fake
+
+
+@asynccontextmanager
+async def app_client():
+    """An httpx client wired to the app in-process, with the lifespan running."""
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
+
+
+_FOODS = (
+    "chicken", "rice", "salmon", "oatmeal", "banana", "yogurt", "eggs", "toast", "pasta",
+    "beef", "broccoli", "avocado", "apple", "cheese", "lentils", "tofu", "potato", "salad",
+)  # fmt: skip
+_FIRST_DAY = date(2010, 1, 1)
+_EXTRAS = ("with", "and", "plus", "on", "side of")
+
+
+def meal_records(count: int, seed: int = 0):
+    """Yield ``count`` export-shaped meal records with a realistic spread of texts."""
+    rng = random.Random(seed)
+    for i in range(count):
+        words = [rng.choice(_FOODS)]
+        for _ in range(rng.randint(0, 3)):
+            words += [rng.choice(_EXTRAS), rng.choice(_FOODS)]
+        yield {
+            # About four meals a day, in date order like an export
+            "date": (_FIRST_DAY + timedelta(days=i // 4 % 7300)).isoformat(),
+            "text_input": " ".join(words),
+            "calories": rng.randint(100, 900),
+            "protein": rng.randint(0, 60),
+            "carbs": rng.randint(0, 120),
+            "fat": rng.randint(0, 40),
+            "sugar": rng.randint(0, 30),
+        }
+
+
+async def create_user(client: httpx.AsyncClient, name: str = "bench") -> str:
+    response = await client.post("/api/users", json={"name": name})
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+class Timer:
+    """Collects durations and summarizes them as percentiles in milliseconds."""
+
+    def __init__(self):
+        self.samples: list[float] = []
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.samples.append(time.perf_counter() - self._started)
+
+    def summary(self) -> str:
+        if not self.samples:
+            return "no samples"
+        ms = sorted(s * 1000 for s in self.samples)
+        p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+        return f"n={len(ms)} p50={statistics.median(ms):.1f}ms p99={p99:.1f}ms max={ms[-1]:.1f}ms"
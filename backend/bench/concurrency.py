@@ -0,0 +1,78 @@
+"""Read latency while many extractions are in flight.
+
+Starts ``--in-flight`` concurrent ``POST /api/meal`` requests whose model call
+takes ``--latency`` seconds, and meanwhile polls ``GET /api/daily/{date}``.
+The response cache is turned off so every poll reaches SQLite. With
+database work off the event loop and no connection held across the model
+call, daily reads should stay close to their idle latency and no request
+should fail.
+
+    python bench/concurrency.py --in-flight 50 --latency 3
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import date
+
+from _common import Timer, app_client, create_user, install_fake_client
+
+# A cache that keeps nothing, so daily reads measure the DB executor
+os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+
+
+async def _poll_daily(client, user_id: str, until: asyncio.Event, timer: Timer, errors: list):
+    while not until.is_set():
+        with timer:
+            response = await client.get(f"/api/daily/{date.today()}", params={"user_id": user_id})
+        if response.status_code != 200:
+            errors.append(f"daily: {response.status_code} {response.text[:200]}")
+
+
+async def main(in_flight: int, latency: float, readers: int):
+    from app import response_cache
+
+    install_fake_client(latency)
+    async with app_client() as client:
+        user_id = await create_user(client)
+        idle, loaded, errors = Timer(), Timer(), []
+
+        for _ in range(50):
+            with idle:
+                await client.get(f"/api/daily/{date.today()}", params={"user_id": user_id})
+
+        async def create(i: int):
+            response = await client.post(
+                "/api/meal",
+                data={"user_id": user_id, "text": f"bench stew number {i}", "use_history": "false"},
+            )
+            if response.status_code != 200 or response.json()["error"]:
+                errors.append(f"meal {i}: {response.status_code} {response.text[:200]}")
+
+        done = asyncio.Event()
+        pollers = [
+            asyncio.create_task(_poll_daily(client, user_id, done, loaded, errors))
+            for _ in range(readers)
+        ]
+        with Timer() as total:
+            await asyncio.gather(*(create(i) for i in range(in_flight)))
+        done.set()
+        await asyncio.gather(*pollers)
+
+    print(f"{in_flight} extractions of {latency}s finished in {total.samples[0]:.2f}s")
+    print(f"GET /api/daily idle:        {idle.summary()}")
+    print(f"GET /api/daily under load:  {loaded.summary()}")
+    print(f"response cache hits: {response_cache.stats()['hits']}")
+    print(f"errors: {len(errors)}")
+    for error in errors[:10]:
+        print(f"  {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--in-flight", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=3.0)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.in_flight, args.latency, args.readers)))
@@ -0,0 +1,84 @@
+"""Image preprocessing: bytes before/after and time per image.
+
+Runs :func:`app.images.prepare` over every image in ``--corpus`` (for example
+a folder of meal and nutrition-label photos). Without a corpus it generates
+a synthetic one: large camera JPEGs with an EXIF rotation and full-size PNG
+screenshots, the two kinds of upload the pipeline is meant to shrink.
+
+    python bench/images.py --corpus ~/label-photos
+"""
+
+import argparse
+import io
+import random
+import time
+from pathlib import Path
+
+import _common  # noqa: F401 — sets up sys.path
+
+from app import images
+
+_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+
+
+def _synthetic_corpus(count: int) -> list[tuple[str, bytes]]:
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(0)
+    corpus = []
+    for i in range(count):
+        photo = i % 2 == 0
+        size = (4032, 3024) if photo else (2880, 1800)
+        img = Image.effect_noise(size, 40).convert("RGB")
+        draw = ImageDraw.Draw(img)
+        for _ in range(200):
+            x, y = rng.randrange(size[0]), rng.randrange(size[1])
+            color = tuple(rng.randrange(256) for _ in range(3))
+            draw.rectangle((x, y, x + rng.randrange(400), y + rng.randrange(120)), fill=color)
+        out = io.BytesIO()
+        if photo:
+            exif = Image.Exif()
+            exif[0x0112] = 6  # orientation: rotate 90 degrees
+            img.save(out, format="JPEG", quality=95, exif=exif)
+            corpus.append((f"photo-{i}.jpg", out.getvalue()))
+        else:
+            img.save(out, format="PNG")
+            corpus.append((f"screenshot-{i}.png", out.getvalue()))
+    return corpus
+
+
+def main(corpus_dir: str | None, count: int):
+    if images.Image is None:
+        raise SystemExit("Pillow is not installed")
+    if corpus_dir:
+        paths = sorted(p for p in Path(corpus_dir).iterdir() if p.suffix.lower() in _SUFFIXES)
+        corpus = [(p.name, p.read_bytes()) for p in paths]
+    else:
+        corpus = _synthetic_corpus(count)
+
+    total_in = total_out = 0
+    total_time = 0.0
+    print(f"{'image':<28}{'before':>12}{'after':>12}{'ratio':>8}{'ms':>9}  type")
+    for name, data in corpus:
+        started = time.perf_counter()
+        prepared = images.prepare(data)
+        elapsed = time.perf_counter() - started
+        total_in += len(data)
+        total_out += len(prepared.data)
+        total_time += elapsed
+        print(
+            f"{name:<28}{len(data):>12,}{len(prepared.data):>12,}"
+            f"{len(prepared.data) / len(data):>8.2f}{elapsed * 1000:>9.1f}  {prepared.mime_type}"
+        )
+    print(
+        f"{len(corpus)} images: {total_in:,} -> {total_out:,} bytes "
+        f"({total_out / total_in:.1%}), {total_time / len(corpus) * 1000:.1f} ms/image"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="directory of images; synthetic if omitted")
+    parser.add_argument("--count", type=int, default=6, help="synthetic images to generate")
+    args = parser.parse_args()
+    main(args.corpus, args.count)
@@ -0,0 +1,138 @@
+"""Per-call AsyncOpenAI construction versus the shared pooled client.
+
+Starts a local OpenAI-compatible stub (every request is answered as a chat
+completion after ``--latency`` seconds) and runs ``--rounds`` rounds of
+``--concurrency`` concurrent extractions two ways. The per-call way builds a new client for
+every call and never closes it, as ``_call_openai`` used to. The pooled way
+uses ``openai_service.init_client()``. The stub is plain HTTP on loopback, so
+TLS handshakes, the larger cost a new client pays against the real API, are
+not included.
+
+    python bench/openai_client.py --concurrency 100 --rounds 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import _common
+from _common import Timer
+
+_connections = 0
+_open: set[asyncio.StreamWriter] = set()
+
+
+async def _serve(latency: float) -> tuple[asyncio.Server, int]:
+    """A minimal HTTP/1.1 keep-alive server answering every request with a completion."""
+    body = json.dumps(
+        {
+            "id": "bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "bench",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": json.dumps(_common._ANSWER)},
+                }
+            ],
+            "usage": {"prompt_tokens": 900, "completion_tokens": 80, "total_tokens": 980},
+        }
+    ).encode()
+    response = (
+        b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+        + f"content-length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        global _connections
+        _connections += 1
+        _open.add(writer)
+        try:
+            while head := await reader.readuntil(b"\r\n\r\n"):
+                length = 0
+                for line in head.split(b"\r\n"):
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                await asyncio.sleep(latency)
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            _open.discard(writer)
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0, backlog=4096)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def _round(call, concurrency: int, timer: Timer, errors: list) -> float:
+    async def one():
+        try:
+            with timer:
+                await call()
+        except Exception as exc:
+            errors.append(type(exc).__name__)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+async def main(concurrency: int, rounds: int, latency: float):
+    global _connections
+    server, port = await _serve(latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+
+    from openai import AsyncOpenAI
+
+    from app import openai_service
+
+    openai_service.OPENAI_BASE_URL = os.environ["OPENAI_BASE_URL"]
+    messages = openai_service._build_messages("bench stew", None)
+    kwargs = {
+        "model": "gpt-4o-mini",
+        "messages": messages,
+        "temperature": 0,
+        "response_format": openai_service._FORMAT,
+    }
+
+    async def per_call():
+        client = AsyncOpenAI(base_url=os.environ["OPENAI_BASE_URL"], max_retries=0)
+        await client.chat.completions.create(**kwargs)
+
+    async def pooled():
+        await openai_service.init_client().chat.completions.create(**kwargs)
+
+    for name, call in (("per-call client", per_call), ("pooled client", pooled)):
+        _connections = 0
+        timer, errors = Timer(), []
+        walls = [await _round(call, concurrency, timer, errors) for _ in range(rounds)]
+        print(f"{name}: {rounds} rounds x {concurrency} concurrent")
+        print(f"  wall per round: {', '.join(f'{w * 1000:.0f}ms' for w in walls)}")
+        print(f"  call latency:   {timer.summary()}")
+        print(f"  connections opened: {_connections}")
+        print(f"  failed calls: {len(errors)} {sorted(set(errors))}")
+
+    await openai_service.close_client()
+    server.close()
+    # Per-call clients are never closed; end their idle connections from this side
+    for writer in list(_open):
+        writer.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.rounds, args.latency))
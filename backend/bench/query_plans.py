@@ -0,0 +1,114 @@
+"""EXPLAIN QUERY PLAN for every statement the hot routes run; fails on a full scan.
+
+Seeds a user with meals, exercises the read and write routes in-process,
+captures each SELECT/UPDATE/DELETE they send to SQLite and asks SQLite how it
+would run it. A plan step that scans a whole table (``SCAN meals`` without
+an index) is reported and makes the script exit non-zero.
+
+    python bench/query_plans.py
+"""
+
+import asyncio
+import re
+
+from _common import app_client, create_user, install_fake_client
+
+# Statements allowed to scan: listing every user is a scan by definition
+_ALLOWED = (re.compile(r"FROM users\s*$"),)
+_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+async def _exercise(client, captured: list):
+    from sqlalchemy import event
+
+    from app import autocomplete
+    from app.database import engine
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if not executemany and verb in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            captured.append((statement, parameters))
+
+    user_id = await create_user(client)
+    for i in range(200):
+        await client.post(
+            "/api/meal/quick",
+            json={
+                "user_id": user_id,
+                "meal_date": f"2024-01-{i % 28 + 1:02d}",
+                "text_input": f"meal {i % 40} with rice",
+                "calories": 500,
+                "protein": 30,
+                "carbs": 50,
+                "fat": 15,
+                "sugar": 5,
+            },
+        )
+    first_page = (await client.get("/api/meals", params={"user_id": user_id, "limit": 20})).json()
+    meal_id = first_page["meals"][0]["meal_id"]
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        params = {"user_id": user_id}
+        await client.get("/api/daily/2024-01-05", params=params)
+        await client.get("/api/weekly", params=params)
+        await client.get("/api/goals", params=params)
+        await client.get("/api/meals/search", params={**params, "q": "meal 1"})
+        # The same search through FTS instead of the in-memory index
+        autocomplete.AUTOCOMPLETE_ENABLED = False
+        await client.get("/api/meals/search", params={**params, "q": "meal 1"})
+        autocomplete.AUTOCOMPLETE_ENABLED = True
+        await client.get(
+            "/api/meals", params={**params, "limit": 20, "cursor": first_page["next_cursor"]}
+        )
+        await client.get("/api/export", params=params)
+        await client.post(
+            "/api/meal",
+            data={"user_id": user_id, "text": "meal 3 with rice", "meal_date": "2024-01-05"},
+        )
+        await client.put(
+            f"/api/meal/{meal_id}",
+            json={"calories": 510, "protein": 30, "carbs": 50, "fat": 16, "sugar": 5},
+        )
+        await client.delete(f"/api/meal/{meal_id}")
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def _plans(captured: list) -> list[tuple[str, list[str]]]:
+    from app.database import engine
+
+    plans = []
+    seen = set()
+    with engine.connect() as conn:
+        for statement, parameters in captured:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            plans.append((statement, [row[-1] for row in rows]))
+    return plans
+
+
+async def main() -> int:
+    captured: list = []
+    install_fake_client(0.0)
+    async with app_client() as client:
+        await _exercise(client, captured)
+
+    failures = 0
+    for statement, steps in _plans(captured):
+        one_line = " ".join(statement.split())
+        scans = [s for s in steps if _FULL_SCAN.match(s)]
+        allowed = any(p.search(one_line) for p in _ALLOWED)
+        status = "FULL SCAN" if scans and not allowed else "ok"
+        failures += status != "ok"
+        print(f"[{status}] {one_line[:160]}")
+        for step in steps:
+            print(f"    {step}")
+    print(f"{len(captured)} statements captured, {failures} with a full table scan")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,80 @@
+"""Meal search latency over a large history, FTS and the in-memory index.
+
+Imports ``--meals`` generated meals for one user through ``/api/import``,
+then times ``/api/meals/search`` for prefix, multi-token and no-match
+queries, once served by the FTS table and once by the autocomplete index.
+
+    python bench/search.py --meals 100000
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import time
+
+from _common import Timer, app_client, create_user, install_fake_client, meal_records
+
+_QUERIES = {
+    "prefix": ["ch", "sal", "ba", "to", "lent"],
+    "multi-token": ["chicken ri", "oat with ban", "eggs and toast", "beef on pot"],
+    "no match": ["zzz", "pizza"],
+}
+
+
+async def _seed(client, user_id: str, meals: int) -> float:
+    body = "".join(json.dumps(r) + "\n" for r in meal_records(meals))
+    started = time.perf_counter()
+    response = await client.post(
+        "/api/import",
+        params={"user_id": user_id},
+        files={"file": ("meals.ndjson", io.BytesIO(body.encode()))},
+    )
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def _time(client, user_id: str, repeat: int):
+    for kind, queries in _QUERIES.items():
+        timer = Timer()
+        hits = 0
+        for _ in range(repeat):
+            for q in queries:
+                with timer:
+                    response = await client.get(
+                        "/api/meals/search", params={"user_id": user_id, "q": q}
+                    )
+                hits += len(response.json())
+        print(f"  {kind:<12} {timer.summary()} avg results={hits / len(timer.samples):.1f}")
+
+
+async def main(meals: int, repeat: int):
+    from app import autocomplete
+    from app.database import SessionLocal
+    from app.db_models import MealSearchEntry
+
+    install_fake_client(0.0)
+    async with app_client() as client:
+        user_id = await create_user(client)
+        seconds = await _seed(client, user_id, meals)
+        with SessionLocal() as db:
+            entries = db.query(MealSearchEntry).filter_by(user_id=user_id).count()
+        print(f"imported {meals} meals in {seconds:.1f}s, {entries} distinct texts")
+
+        autocomplete.AUTOCOMPLETE_ENABLED = False
+        print("FTS:")
+        await _time(client, user_id, repeat)
+
+        autocomplete.AUTOCOMPLETE_ENABLED = True
+        started = time.perf_counter()
+        await client.get("/api/meals/search", params={"user_id": user_id, "q": "ch"})
+        print(f"in-memory index (cold load {(time.perf_counter() - started) * 1000:.0f}ms):")
+        await _time(client, user_id, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--meals", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.meals, args.repeat))
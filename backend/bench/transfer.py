@@ -0,0 +1,89 @@
+"""Bulk import and export throughput.
+
+Writes ``--rows`` generated meals to a temporary NDJSON or CSV file, imports
+it into a new user through ``/api/import``, streams the user back out through
+``/api/export`` and imports that export again, which skips every row. Reports
+rows per second for each step.
+
+    python bench/transfer.py --rows 1000000 --format ndjson
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import tempfile
+import time
+
+from _common import app_client, create_user, install_fake_client, meal_records
+
+_COLUMNS = ("date", "text_input", "calories", "protein", "carbs", "fat", "sugar")
+
+
+def _write(path: str, rows: int, fmt: str):
+    with open(path, "w", newline="") as out:
+        if fmt == "csv":
+            writer = csv.DictWriter(out, _COLUMNS)
+            writer.writeheader()
+            writer.writerows(meal_records(rows))
+        else:
+            out.writelines(json.dumps(r) + "\n" for r in meal_records(rows))
+
+
+async def _import(client, user_id: str, path: str, fmt: str) -> dict:
+    with open(path, "rb") as upload:
+        response = await client.post(
+            "/api/import",
+            params={"user_id": user_id, "format": fmt},
+            files={"file": (f"meals.{fmt}", upload)},
+            timeout=None,
+        )
+    response.raise_for_status()
+    return response.json()
+
+
+async def _export(client, user_id: str, path: str, fmt: str) -> int:
+    size = 0
+    params = {"user_id": user_id, "format": fmt}
+    async with client.stream("GET", "/api/export", params=params, timeout=None) as response:
+        response.raise_for_status()
+        with open(path, "wb") as out:
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                out.write(chunk)
+    return size
+
+
+def _report(step: str, rows: int, started: float, detail: str = ""):
+    seconds = time.perf_counter() - started
+    print(f"{step:<10} {rows} rows in {seconds:.1f}s ({rows / seconds:,.0f} rows/s){detail}")
+
+
+async def main(rows: int, fmt: str):
+    install_fake_client(0.0)
+    workdir = tempfile.mkdtemp(prefix="brotein-transfer-")
+    source, exported = f"{workdir}/source.{fmt}", f"{workdir}/export.{fmt}"
+    _write(source, rows, fmt)
+
+    async with app_client() as client:
+        user_id = await create_user(client)
+
+        started = time.perf_counter()
+        result = await _import(client, user_id, source, fmt)
+        _report("import", result["imported"], started, f", {result['skipped']} skipped")
+
+        started = time.perf_counter()
+        size = await _export(client, user_id, exported, fmt)
+        _report("export", rows, started, f", {size / 1e6:.0f} MB")
+
+        started = time.perf_counter()
+        result = await _import(client, user_id, exported, fmt)
+        _report("reimport", result["skipped"], started, f", {result['imported']} imported")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.format))
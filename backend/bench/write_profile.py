@@ -0,0 +1,110 @@
+"""Write-heavy load under SQLite's stock settings versus the tuned profile.
+
+Each profile runs in a fresh subprocess against its own database, since the
+profile is read from the environment when ``app.database`` is imported.
+Concurrent writers post quick meals while readers poll the daily view.
+The script reports write throughput and read latency.
+
+    python bench/write_profile.py --writes 2000 --writers 8
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# SQLite's own defaults, i.e. what the app ran with before the profile existed
+PROFILES = {
+    "default": {
+        "DB_JOURNAL_MODE": "DELETE",
+        "DB_SYNCHRONOUS": "FULL",
+        "DB_MMAP_SIZE": "0",
+        "DB_CACHE_SIZE": "-2000",
+        "DB_TEMP_STORE": "DEFAULT",
+    },
+    "tuned": {},
+}
+
+
+async def _run(writes: int, writers: int, readers: int):
+    from _common import Timer, app_client, create_user
+
+    async with app_client() as client:
+        user_id = await create_user(client)
+        write_timer, read_timer = Timer(), Timer()
+        remaining = iter(range(writes))
+        done = asyncio.Event()
+
+        async def writer():
+            for i in remaining:
+                with write_timer:
+                    response = await client.post(
+                        "/api/meal/quick",
+                        json={
+                            "user_id": user_id,
+                            "meal_date": f"2024-01-{i % 28 + 1:02d}",
+                            "text_input": f"write bench meal {i % 200}",
+                            "calories": 500,
+                            "protein": 30,
+                            "carbs": 50,
+                            "fat": 15,
+                            "sugar": 5,
+                        },
+                    )
+                response.raise_for_status()
+
+        async def reader():
+            i = 0
+            while not done.is_set():
+                with read_timer:
+                    await client.get(
+                        f"/api/daily/2024-01-{i % 28 + 1:02d}", params={"user_id": user_id}
+                    )
+                i += 1
+
+        reading = [asyncio.create_task(reader()) for _ in range(readers)]
+        started = time.perf_counter()
+        await asyncio.gather(*(writer() for _ in range(writers)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*reading)
+
+    print(f"  {writes / elapsed:,.0f} writes/s ({writes} in {elapsed:.2f}s)")
+    print(f"  write latency: {write_timer.summary()}")
+    print(f"  read latency:  {read_timer.summary()}")
+
+
+def main(args):
+    if args.profile:
+        asyncio.run(_run(args.writes, args.writers, args.readers))
+        return
+    for name, overrides in PROFILES.items():
+        print(f"{name} profile {overrides or '(app defaults)'}")
+        env = {k: v for k, v in os.environ.items() if not k.startswith("DB_")}
+        env.update(overrides)
+        # On disk, not tmpfs, when TMPDIR points at a real disk: fsync cost is the point
+        env["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="brotein-bench-"), "db")
+        subprocess.run(
+            [sys.executable, str(Path(__file__)), "--profile", name, *args.passthrough],
+            env=env,
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--profile", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.passthrough = [
+        f"--writes={args.writes}",
+        f"--writers={args.writers}",
+        f"--readers={args.readers}",
+    ]
+    main(args)